@@ -1,153 +1,285 @@
+import threading
+
 import streamlit as st
-import sqlite3
 from datetime import datetime
-from typing import List
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
-DB_PATH = "data.db"
+from config import (
+    DB_PATH, DB_POOL_SIZE, DB_POOL_TIMEOUT, MATCH_CACHE_SIZE, MATCH_CACHE_TTL, MATCH_DUPLICATE_THRESHOLD, MATCH_ENGINE,
+    MATCH_MAX_SHARDS, MATCH_POOL_MIN_TASKS, MATCH_SNAPSHOT_DIR, MATCH_SNAPSHOT_MAX_LAG, MATCH_SYNONYM_WEIGHT, MATCH_WEIGHTS,
+    MATCH_WORKERS, STORAGE_PROFILE,
+)
+from db import ConnectionPool, corpus_version, migrate, read_counters
+from geo import ZipIndex
+from matching import (
+    HelperMatrix, HybridRanker, RankingCache, ScoringPool, ShardedIndex, SynonymMap, TaskSnapshot, backfill_vectors,
+    backfill_signatures, engine_analyzer, find_near_duplicate, minhash_signature, normalize_skills, store_signature,
+    task_text, vectorize, write_task_snapshot,
+)
+
 APP_URL = "https://neardoer.streamlit.app"
+# Any non-text weight blends distance/price/recency into the shown score.
+HYBRID_RANKING = any(w for c, w in MATCH_WEIGHTS.items() if c != "text")
+# Explicit so rows keep their shape as columns (e.g. tasks.vector) are added.
+TASK_COLUMNS = "id, title, description, category, price, zip, status, posted_by, accepted_by, created_at, updated_at"
 
 # -------------------------
 # Database helpers
 # -------------------------
-def get_conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+@st.cache_resource(show_spinner=False)
+def get_pool():
+    # One pool per server process, shared by every session and rerun.
+    return ConnectionPool(DB_PATH, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, profile=STORAGE_PROFILE)
 
+@st.cache_resource(show_spinner=False)
 def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            role TEXT NOT NULL CHECK(role IN ('Poster','Helper')),
-            zip TEXT,
-            skills TEXT
-        )
-    """)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT NOT NULL,
-            category TEXT,
-            price TEXT,
-            zip TEXT NOT NULL,
-            status TEXT NOT NULL DEFAULT 'Open' CHECK(status IN ('Open','Accepted','Completed')),
-            posted_by INTEGER,
-            accepted_by INTEGER,
-            created_at TEXT,
-            updated_at TEXT,
-            FOREIGN KEY(posted_by) REFERENCES users(id),
-            FOREIGN KEY(accepted_by) REFERENCES users(id)
-        )
-    """)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS testimonials (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            role TEXT NOT NULL,
-            quote TEXT NOT NULL,
-            created_at TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
+    # Bootstraps/migrates the schema once per server process; later reruns hit
+    # the cache. A failure raises and isn't cached, so the next rerun retries.
+    with get_pool().writer() as conn:
+        migrate(conn)
+        backfill_signatures(conn)
 
 # -------------------------
 # Data functions
 # -------------------------
 def get_or_create_user(name, role, zip_code, skills=""):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM users WHERE name=? AND role=? AND zip=?", (name, role, zip_code))
-    row = cur.fetchone()
-    if row:
-        user_id = row[0]
-    else:
+    # Lookup and insert share the writer so two sessions can't both create the user.
+    with get_pool().writer() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id FROM users WHERE name=? AND role=? AND zip=?", (name, role, zip_code))
+        row = cur.fetchone()
+        if row:
+            return row[0]
         cur.execute("INSERT INTO users (name, role, zip, skills) VALUES (?,?,?,?)",
                     (name, role, zip_code, skills))
-        conn.commit()
-        user_id = cur.lastrowid
-    conn.close()
-    return user_id
+        return cur.lastrowid
 
 def create_task(title, description, category, price, zip_code, posted_by):
+    # Returns (task id, the open task it near-duplicates or None), the latter
+    # as find_near_duplicate describes it. Resubmitting one's own open task in
+    # the same ZIP is merged: nothing is inserted, the existing task takes the
+    # new price, and its id comes back. Any other near-duplicate (the poster's
+    # task elsewhere, or another poster's here) is posted and flagged through
+    # tasks.duplicate_of.
     now = datetime.utcnow().isoformat()
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO tasks (title, description, category, price, zip, status, posted_by, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, 'Open', ?, ?, ?)
-    """, (title, description, category, price, zip_code, posted_by, now, now))
-    conn.commit()
-    conn.close()
+    get_match_index()  # built before taking the writer: the first build backfills through it
+    text = task_text((None, title, description, category))
+    signature = minhash_signature(text) if MATCH_DUPLICATE_THRESHOLD > 0 else None
+    with get_pool().writer() as conn:
+        duplicate = None
+        if signature is not None:
+            duplicate = find_near_duplicate(conn, signature, posted_by, zip_code, MATCH_DUPLICATE_THRESHOLD)
+            if duplicate and duplicate[1] == posted_by and duplicate[2] == zip_code:
+                if duplicate[4] != price:
+                    conn.execute("UPDATE tasks SET price=?, updated_at=? WHERE id=?", (price, now, duplicate[0]))
+                return duplicate[0], duplicate
+        vector = vectorize(conn, text)
+        cur = conn.execute("""
+            INSERT INTO tasks (title, description, category, price, zip, status, posted_by, created_at, updated_at, vector,
+                               duplicate_of)
+            VALUES (?, ?, ?, ?, ?, 'Open', ?, ?, ?, ?, ?)
+        """, (title, description, category, price, zip_code, posted_by, now, now, vector, duplicate and duplicate[0]))
+        if signature is not None:
+            store_signature(conn, cur.lastrowid, signature)
+    refresh_task_snapshot()
+    return cur.lastrowid, duplicate
 
 def accept_task(task_id, helper_id):
     now = datetime.utcnow().isoformat()
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE tasks SET status='Accepted', accepted_by=?, updated_at=? WHERE id=? AND status='Open'",
-        (helper_id, now, task_id),
-    )
-    conn.commit()
-    conn.close()
+    with get_pool().writer() as conn:
+        conn.execute(
+            "UPDATE tasks SET status='Accepted', accepted_by=?, updated_at=? WHERE id=? AND status='Open'",
+            (helper_id, now, task_id),
+        )
+    get_match_index().discard([task_id])
+    refresh_task_snapshot()
 
 def complete_task(task_id):
     now = datetime.utcnow().isoformat()
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE tasks SET status='Completed', updated_at=? WHERE id=? AND status='Accepted'",
-        (now, task_id),
-    )
-    conn.commit()
-    conn.close()
+    with get_pool().writer() as conn:
+        conn.execute(
+            "UPDATE tasks SET status='Completed', updated_at=? WHERE id=? AND status='Accepted'",
+            (now, task_id),
+        )
 
 def add_testimonial(name, role, quote):
     now = datetime.utcnow().isoformat()
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO testimonials (name, role, quote, created_at) VALUES (?,?,?,?)",
-                (name, role, quote, now))
-    conn.commit()
-    conn.close()
+    with get_pool().writer() as conn:
+        conn.execute("INSERT INTO testimonials (name, role, quote, created_at) VALUES (?,?,?,?)",
+                     (name, role, quote, now))
 
 def fetch_testimonials(limit=6):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT name, role, quote FROM testimonials ORDER BY id DESC LIMIT ?", (limit,))
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    with get_pool().reader() as conn:
+        return conn.execute(
+            "SELECT name, role, quote FROM testimonials ORDER BY id DESC LIMIT ?", (limit,)
+        ).fetchall()
+
+def fetch_posted_tasks(poster_id):
+    with get_pool().reader() as conn:
+        return conn.execute(
+            "SELECT id,title,description,status FROM tasks WHERE posted_by=? ORDER BY id DESC", (poster_id,)
+        ).fetchall()
+
+def fetch_open_tasks(zip_codes, category="All"):
+    # zip IN (...) is one idx_tasks_open_zip* range scan per ZIP.
+    marks = ",".join("?" * len(zip_codes))
+    with get_pool().reader() as conn:
+        if category == "All":
+            return conn.execute(
+                f"SELECT {TASK_COLUMNS} FROM tasks WHERE status='Open' AND zip IN ({marks}) ORDER BY id DESC",
+                list(zip_codes),
+            ).fetchall()
+        return conn.execute(
+            f"SELECT {TASK_COLUMNS} FROM tasks WHERE status='Open' AND zip IN ({marks}) AND category=? ORDER BY id DESC",
+            [*zip_codes, category],
+        ).fetchall()
+
+def fetch_accepted_tasks(helper_id):
+    with get_pool().reader() as conn:
+        return conn.execute(
+            "SELECT title,description,status FROM tasks WHERE accepted_by=? ORDER BY id DESC", (helper_id,)
+        ).fetchall()
 
 def get_stats():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM users"); users = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM tasks"); posted = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM tasks WHERE status='Accepted'"); accepted = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM tasks WHERE status='Completed'"); completed = cur.fetchone()[0]
-    conn.close()
-    return users, posted, accepted, completed
+    with get_pool().reader() as conn:
+        counts = read_counters(conn)
+    return counts["users"], counts["tasks"], counts["accepted"], counts["completed"]
 
 # -------------------------
 # AI Task Matching
 # -------------------------
-def rank_tasks_by_match(tasks: List[tuple], helper_keywords: str):
-    if not tasks:
-        return []
-    docs = [f"{t[1]} {t[2]} {t[3]}" for t in tasks]
-    query = helper_keywords or ""
-    vectorizer = TfidfVectorizer(stop_words="english", ngram_range=(1, 2))
-    X = vectorizer.fit_transform([*docs, query])
-    sims = cosine_similarity(X[:-1], X[-1])
-    scores = [float(s[0]) for s in sims]
-    with_scores = list(zip(tasks, scores))
-    with_scores.sort(key=lambda x: x[1], reverse=True)
-    return with_scores
+@st.cache_resource(show_spinner=False)
+def get_match_index():
+    # One index per ZIP (and category) per server process, built on first use
+    # (the tfidf engine from the stored task vectors, without re-tokenizing any
+    # text) and brought up to date on every sync_match_index() call;
+    # accept_task drops accepted tasks from every live shard. With
+    # MATCH_WORKERS set, large top-k searches run in a shared process pool.
+    # New shards start from the on-disk task snapshot when there is one.
+    pool = ScoringPool(MATCH_WORKERS, MATCH_POOL_MIN_TASKS) if MATCH_WORKERS > 0 else None
+    index = ShardedIndex(
+        MATCH_ENGINE, max_shards=MATCH_MAX_SHARDS, synonyms=get_synonyms(), pool=pool, snapshot=get_task_snapshot()
+    )
+    with get_pool().writer() as conn:
+        backfill_vectors(conn)
+    refresh_task_snapshot()
+    return index
+
+@st.cache_resource(show_spinner=False)
+def get_task_snapshot():
+    # The newest snapshot in MATCH_SNAPSHOT_DIR, memory-mapped so every server
+    # process shares its pages; None without one. A snapshot written from
+    # another database (or ahead of this one) is ignored, and
+    # refresh_task_snapshot replaces it.
+    snapshot = TaskSnapshot.load(MATCH_SNAPSHOT_DIR) if MATCH_SNAPSHOT_DIR else None
+    if snapshot is not None:
+        with get_pool().reader() as conn:
+            if not snapshot.matches(conn):
+                return None
+    return snapshot
+
+@st.cache_resource(show_spinner=False)
+def get_snapshot_lock():
+    return threading.Lock()
+
+def refresh_task_snapshot():
+    # Once the newest snapshot lags the corpus by more than
+    # MATCH_SNAPSHOT_MAX_LAG changes, or was written from another database,
+    # write a new one on a background thread (one at a time per process) for
+    # the next server start to load.
+    if not MATCH_SNAPSHOT_DIR:
+        return
+    pool = get_pool()
+    latest = TaskSnapshot.latest_meta(MATCH_SNAPSHOT_DIR)
+    with pool.reader() as conn:
+        if latest is not None and TaskSnapshot.fits(conn, latest):
+            if corpus_version(conn) - latest["version"] <= MATCH_SNAPSHOT_MAX_LAG:
+                return
+    lock = get_snapshot_lock()
+    if not lock.acquire(blocking=False):
+        return
+
+    def write():
+        try:
+            with pool.reader() as conn:
+                write_task_snapshot(conn, MATCH_SNAPSHOT_DIR)
+        finally:
+            lock.release()
+
+    threading.Thread(target=write, name="task-snapshot", daemon=True).start()
+
+def sync_match_index(zip_code, category=None):
+    # The index is fetched (built on first use, which checks out connections of
+    # its own) before this reader is taken, so one session never holds two.
+    index = get_match_index()
+    with get_pool().reader() as conn:
+        return index.shard(conn, zip_code, category)
+
+def rank_open_tasks(tasks, skills, category, k, origin_zip):
+    # Every ZIP among the tasks is scored in its own shard. Text-only weights
+    # keep the pruned top-k path; otherwise all candidates get a text score and
+    # the hybrid ranker blends in distance, price and recency.
+    category = None if category == "All" else category
+    index = get_match_index()  # before the reader, as in sync_match_index
+    with get_pool().reader() as conn:
+        if not HYBRID_RANKING:
+            return index.rank(conn, tasks, skills, k=k, category=category)
+        text = index.score(conn, tasks, skills, category)
+    return get_hybrid_ranker().rank(tasks, text, origin_zip, k=k)
+
+@st.cache_resource(show_spinner=False)
+def get_ranking_cache():
+    return RankingCache(MATCH_CACHE_SIZE, MATCH_CACHE_TTL)
+
+def find_tasks(zip_code, radius, category, skills, k):
+    # (task, score, matched terms) best first. Reruns with the same filters and
+    # skills are served from the cache until a task is posted, accepted or
+    # completed in any process. The version is read before the tasks, so a
+    # cached result is never older than its key.
+    with get_pool().reader() as conn:
+        version = corpus_version(conn)
+    key = (zip_code, radius, category, normalize_skills(skills), k)
+    found = get_ranking_cache().get(key, version)
+    if found is None:
+        open_tasks = fetch_open_tasks(get_zip_index().nearby(zip_code, radius), category)
+        if skills:
+            ranked = rank_open_tasks(open_tasks, skills, category, k, zip_code)
+            index = get_match_index()
+            with get_pool().reader() as conn:
+                reasons = index.explain(
+                    conn, [t for t, _ in ranked], skills, None if category == "All" else category
+                )
+            found = [(t, sc, [term for term, _ in terms]) for (t, sc), terms in zip(ranked, reasons)]
+        else:
+            found = [(t, 0.0, []) for t in open_tasks[:k]]
+        get_ranking_cache().put(key, version, found)
+    return found
+
+@st.cache_resource(show_spinner=False)
+def get_zip_index():
+    return ZipIndex.load()
+
+@st.cache_resource(show_spinner=False)
+def get_hybrid_ranker():
+    return HybridRanker(get_zip_index(), MATCH_WEIGHTS)
+
+@st.cache_resource(show_spinner=False)
+def get_synonyms():
+    # Expansion maps word terms; the chargram engine's typo tolerance stands in for it.
+    if MATCH_SYNONYM_WEIGHT <= 0 or MATCH_ENGINE == "chargram":
+        return None
+    return SynonymMap.load(weight=MATCH_SYNONYM_WEIGHT)
+
+@st.cache_resource(show_spinner=False)
+def get_helper_matrix():
+    # Every helper's skills, analyzed (and synonym-expanded) once per server
+    # process; new sign-ups are pulled in by recommend_helpers().
+    return HelperMatrix(get_synonyms(), analyzer=engine_analyzer(MATCH_ENGINE))
+
+def recommend_helpers(task, zip_code, k=5):
+    helpers = get_helper_matrix()
+    with get_pool().reader() as conn:
+        helpers.sync(conn)
+    return helpers.recommend(sync_match_index(zip_code), task, k=k, zip_code=zip_code)
 
 # -------------------------
 # UI helpers
@@ -359,15 +491,33 @@ if user["role"] == "Poster":
             pr = st.text_input("Price")
             zp = st.text_input("ZIP", value=user["zip"])
             posted = st.form_submit_button("Post Task")
+            new_task = None
             if posted and t and d and zp:
-                create_task(t,d,cat,pr,zp,user["id"])
-                st.success("Task posted!")
+                task_id, duplicate = create_task(t,d,cat,pr,zp,user["id"])
+                new_task = (task_id, t, d, cat)
+                if duplicate and duplicate[0] == task_id:
+                    changed = f" Its price is now {pr}." if pr != duplicate[4] else ""
+                    st.info(f"You already have “{duplicate[3]}” open in {zp}, so it wasn't posted again.{changed}")
+                else:
+                    st.success("Task posted!")
+                    if duplicate and duplicate[1] == user["id"]:
+                        st.caption(f"You also have a very similar task open in {duplicate[2]}.")
+                    elif duplicate:
+                        st.caption("A very similar task is already open in this ZIP.")
+        if new_task:
+            st.markdown('<div class="section-title"><span class="section-emoji">🤝</span><span>Helpers who match</span></div>', unsafe_allow_html=True)
+            candidates = recommend_helpers(new_task, zp)
+            if not candidates:
+                st.markdown("<div class='card'>No helpers with matching skills in this ZIP yet.</div>", unsafe_allow_html=True)
+            for (hid, hname, hzip, hskills), sc in candidates:
+                st.markdown(
+                    f"<div class='card'><b style='color:#e2e8f0'>{hname}</b> (AI match {sc:.2f})<br>{hskills}</div>",
+                    unsafe_allow_html=True
+                )
 
     with col2:
         st.markdown('<div class="section-title"><span class="section-emoji">🗂️</span><span>Your Tasks</span></div>', unsafe_allow_html=True)
-        conn = get_conn(); cur = conn.cursor()
-        cur.execute("SELECT id,title,description,status FROM tasks WHERE posted_by=? ORDER BY id DESC", (user["id"],))
-        rows = cur.fetchall(); conn.close()
+        rows = fetch_posted_tasks(user["id"])
         if not rows:
             st.markdown("<div class='card'>No tasks yet.</div>", unsafe_allow_html=True)
         for tid, tit, desc, stt in rows:
@@ -385,23 +535,20 @@ else:
     with col1:
         st.markdown('<div class="section-title"><span class="section-emoji">🔎</span><span>Find Tasks</span></div>', unsafe_allow_html=True)
         filt = st.text_input("Filter by ZIP", value=user["zip"])
+        radius = st.select_slider("Within (miles)", options=[0, 1, 2, 5, 10, 25], value=0)
         catpick = st.selectbox("Category", ["All","Cleaning","Errands","Assembly","Yardwork","Tech Help","Other"])
-        conn = get_conn(); cur = conn.cursor()
-        if catpick == "All":
-            cur.execute("SELECT * FROM tasks WHERE status='Open' AND zip=? ORDER BY id DESC", (filt,))
-        else:
-            cur.execute("SELECT * FROM tasks WHERE status='Open' AND zip=? AND category=? ORDER BY id DESC", (filt, catpick))
-        open_tasks = cur.fetchall(); conn.close()
-
-        ranked = rank_tasks_by_match(open_tasks, user.get("skills","")) if user.get("skills") else [(t, 0.0) for t in open_tasks]
+        top_n = st.slider("Best matches to show", 1, 50, 10)
+        ranked = find_tasks(filt, radius, catpick, user.get("skills", ""), top_n)
         if not ranked:
-            st.markdown("<div class='card'>No open tasks in this ZIP.</div>", unsafe_allow_html=True)
-        for (task, sc) in ranked:
+            st.markdown(f"<div class='card'>No open tasks {'nearby' if radius else 'in this ZIP'}.</div>", unsafe_allow_html=True)
+        for (task, sc, terms) in ranked:
             tid, tit, desc, cat, pr, zp, stt, pid, aid, _, _ = task
             price_html = f" · 💵 {pr}" if pr else ""
+            why_html = f"<br><small>Matched on: {', '.join(terms)}</small>" if terms else ""
+            score_label = "overall score" if HYBRID_RANKING else "AI match"
             st.markdown(
                 f"<div class='card'><b style='color:#e2e8f0'>{tit}</b> "
-                f"(AI match {sc:.2f}){price_html}<br>{desc}</div>",
+                f"({score_label} {sc:.2f}){price_html}<br>{desc}{why_html}</div>",
                 unsafe_allow_html=True
             )
             if st.button("Accept Task", key=f"a{tid}"):
@@ -410,9 +557,7 @@ else:
 
     with col2:
         st.markdown('<div class="section-title"><span class="section-emoji">📑</span><span>Your Accepted Tasks</span></div>', unsafe_allow_html=True)
-        conn = get_conn(); cur = conn.cursor()
-        cur.execute("SELECT title,description,status FROM tasks WHERE accepted_by=? ORDER BY id DESC", (user["id"],))
-        rows = cur.fetchall(); conn.close()
+        rows = fetch_accepted_tasks(user["id"])
         if not rows:
             st.markdown("<div class='card'>You haven’t accepted any tasks yet.</div>", unsafe_allow_html=True)
         for (tit, desc, stt) in rows:
@@ -0,0 +1 @@
+"""Performance benchmarks. Run from the repo root, e.g. ``python -m benchmarks.bench_storage``."""
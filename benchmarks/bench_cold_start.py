@@ -0,0 +1,101 @@
+"""Cold-start cost of the TF-IDF matcher: stored vectors in SQLite vs a memory-mapped snapshot.
+
+    python -m benchmarks.bench_cold_start [--tasks 100000] [--zips 50] [--repeat 3]
+
+A temporary database is seeded with generated open tasks (vectors
+backfilled) and a task snapshot is written next to it. Each run then starts
+from nothing, as a freshly started server process would, and times:
+
+* ``shards``: building one ShardedIndex shard per ZIP, from the database
+  (read and decode every stored vector) vs from the snapshot;
+* ``full``: one TfidfIndex over every open task, the same two ways.
+
+Peak Python-heap allocation (tracemalloc) is reported next to each timing.
+Snapshot pages are mapped files, so they are not counted there; every
+process maps the same copy.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.corpus import generate_tasks, make_zips, seed_database
+from db import ConnectionPool, migrate
+from matching import ShardedIndex, TaskSnapshot, TfidfIndex, backfill_vectors, write_task_snapshot
+
+
+def build_shards(conn, zips, snapshot):
+    index = ShardedIndex("tfidf", max_shards=len(zips), snapshot=snapshot)
+    for zip_code in zips:
+        index.shard(conn, zip_code)
+
+
+def build_full(conn, snapshot):
+    index = TfidfIndex()
+    if snapshot is not None:
+        index.load_snapshot(conn, snapshot)
+    index.sync(conn)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def measure(fn, repeat):
+    best = min(_timed(fn) for _ in range(repeat))
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"s": round(best, 3), "peak_mb": round(peak / 2 ** 20, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--zips", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (best is reported)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="neardoer-bench-")
+    try:
+        pool = ConnectionPool(os.path.join(workdir, "data.db"), size=1)
+        zips = make_zips(args.zips, args.seed)
+        with pool.writer() as conn:
+            migrate(conn)
+            seed_database(conn, generate_tasks(args.tasks, args.seed, zips))
+            backfill_vectors(conn)
+        snapshot_dir = os.path.join(workdir, "snapshot")
+        with pool.reader() as conn:
+            write_s = _timed(lambda: write_task_snapshot(conn, snapshot_dir))
+            snapshot = TaskSnapshot.load(snapshot_dir)
+            results = {"snapshot_write_s": round(write_s, 3)}
+            for case, fn in (("shards", lambda s: build_shards(conn, zips, s)), ("full", lambda s: build_full(conn, s))):
+                results[case] = {
+                    "database": measure(lambda: fn(None), args.repeat),
+                    "snapshot": measure(lambda: fn(snapshot), args.repeat),
+                }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.tasks} tasks over {args.zips} ZIPs; snapshot written in {results['snapshot_write_s']} s")
+    print(f"{'case':<8}{'source':<10}{'s':>8}{'peak MB':>9}")
+    for case in ("shards", "full"):
+        for source, r in results[case].items():
+            print(f"{case:<8}{source:<10}{r['s']:>8}{r['peak_mb']:>9}")
+
+
+if __name__ == "__main__":
+    main()
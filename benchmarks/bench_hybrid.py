@@ -0,0 +1,67 @@
+"""Cost of hybrid ranking (text, distance, price, recency) over candidate sets.
+
+    python -m benchmarks.bench_hybrid [--sizes 1000 5000 20000] [--repeat 200]
+
+Candidates are synthetic tasks spread over real ZIPs around one helper. Two
+timings per size: ``hybrid_scores`` alone (the NumPy blend over already
+parsed feature rows) and ``HybridRanker.rank`` end to end (row gather,
+blend and top-10 selection), both with warm feature caches.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.corpus import generate_tasks
+from geo import ZipIndex
+from matching import HybridRanker, hybrid_scores
+
+WEIGHTS = {"text": 1.0, "distance": 0.2, "price": 0.1, "recency": 0.1}
+ORIGIN_ZIP = "94110"
+
+
+def timed(fn, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1e6
+    return {"p50_us": round(float(np.percentile(latencies, 50)), 1),
+            "p95_us": round(float(np.percentile(latencies, 95)), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 5000, 20000])
+    parser.add_argument("--repeat", type=int, default=200, help="timed runs per size")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    zip_index = ZipIndex.load()
+    zips = zip_index.nearby(ORIGIN_ZIP, 25)
+    ranker = HybridRanker(zip_index, WEIGHTS)
+    origin = zip_index.radians([ORIGIN_ZIP])[0]
+    rng = np.random.default_rng(7)
+    results = {}
+    for size in args.sizes:
+        tasks = generate_tasks(size, seed=7, zips=zips)
+        text = rng.random(size)
+        features = ranker.features(tasks)  # parse once, as the app does on first sight
+        results[str(size)] = {
+            "blend": timed(lambda: hybrid_scores(text, features, origin, None, WEIGHTS), args.repeat),
+            "rank": timed(lambda: ranker.rank(tasks, text, ORIGIN_ZIP, k=10), args.repeat),
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'candidates':>10}{'blend p50':>12}{'blend p95':>12}{'rank p50':>12}{'rank p95':>12}  (microseconds)")
+    for size, r in results.items():
+        print(f"{size:>10}{r['blend']['p50_us']:>12}{r['blend']['p95_us']:>12}"
+              f"{r['rank']['p50_us']:>12}{r['rank']['p95_us']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Latency, throughput and peak memory of each match engine on synthetic corpora.
+
+    python -m benchmarks.bench_matching [--engines tfidf hashing] [--sizes 1000 10000 100000]
+                                        [--queries 200] [--save-baseline] [--check]
+
+For every engine and corpus size a fresh index is built from generated open
+tasks, then helper skill strings are ranked against the whole corpus with
+``rank_tasks_by_match(..., k=10)`` -- the Helper view's heaviest case.
+Latencies are timed without tracing; peak memory comes from a second,
+tracemalloc-traced build and query pass.
+
+Results are compared against the JSON baseline (``--baseline``) and p50/p95
+changes beyond ``--tolerance`` are flagged; ``--check`` turns a flagged
+regression into a non-zero exit. Baselines are only comparable on the same
+machine, so refresh it with ``--save-baseline`` after hardware changes.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import sklearn
+
+from benchmarks.corpus import generate_helpers, generate_tasks, make_zips
+from matching import ENGINES, make_index, rank_tasks_by_match
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline_matching.json")
+TOP_N = 10
+
+
+def build(engine, tasks):
+    index = make_index(engine)
+    index.add(tasks)
+    if hasattr(index, "refresh"):
+        index.refresh(wait=True)
+    return index
+
+
+def run_queries(index, tasks, queries):
+    latencies = []
+    for skills in queries:
+        start = time.perf_counter()
+        rank_tasks_by_match(tasks, skills, index, k=TOP_N)
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies)
+
+
+def peak_memory(engine, tasks, queries):
+    tracemalloc.start()
+    try:
+        index = build(engine, tasks)
+        run_queries(index, tasks, queries)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench(engine, tasks, queries):
+    start = time.perf_counter()
+    index = build(engine, tasks)
+    build_s = time.perf_counter() - start
+    run_queries(index, tasks, queries[:5])  # warm caches (postings, idf, projections)
+    latencies = run_queries(index, tasks, queries)
+    return {
+        "build_s": round(build_s, 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+        "queries_per_s": round(len(latencies) / latencies.sum(), 1),
+        "peak_mb": round(peak_memory(engine, tasks, queries[:20]) / 2 ** 20, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing p50/p95 changes against ``baseline``, and whether any regressed."""
+    lines, regressed = [], False
+    for engine, sizes in results.items():
+        for size, r in sizes.items():
+            old = baseline.get(engine, {}).get(size)
+            if not old:
+                continue
+            for key in ("p50_ms", "p95_ms"):
+                change = r[key] / old[key] - 1 if old[key] else 0.0
+                flag = change > tolerance
+                regressed |= flag
+                if flag or abs(change) > tolerance:
+                    lines.append(f"{'REGRESSION' if flag else 'improved':<11}{engine:<9}{size:>8} "
+                                 f"{key}: {old[key]} -> {r[key]} ({change:+.0%})")
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200, help="helper queries per run")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50/p95 slowdown (default: 25%%)")
+    parser.add_argument("--check", action="store_true", help="exit non-zero on a regression")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    zips = make_zips(50, args.seed)
+    queries = [h[3] for h in generate_helpers(args.queries, args.seed, zips)]
+    corpus = generate_tasks(max(args.sizes), args.seed, zips)
+    results = {
+        engine: {str(size): bench(engine, corpus[:size], queries) for size in args.sizes}
+        for engine in args.engines
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'engine':<9}{'tasks':>8}{'build s':>9}{'p50 ms':>9}{'p95 ms':>9}{'q/s':>9}{'peak MB':>9}")
+        for engine, sizes in results.items():
+            for size, r in sizes.items():
+                print(f"{engine:<9}{size:>8}{r['build_s']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+                      f"{r['queries_per_s']:>9}{r['peak_mb']:>9}")
+
+    if args.save_baseline:
+        meta = {
+            "machine": platform.machine(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "queries": args.queries,
+            "seed": args.seed,
+        }
+        with open(args.baseline, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}", file=sys.stderr)
+        return
+    if not os.path.exists(args.baseline):
+        return
+    with open(args.baseline) as f:
+        lines, regressed = compare(results, json.load(f)["results"], args.tolerance)
+    for line in lines:
+        print(line, file=sys.stderr)
+    if args.check and regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Multi-session ranking throughput with and without the scoring process pool.
+
+    python -m benchmarks.bench_pool [--engines tfidf hashing] [--tasks 100000]
+                                    [--sessions 1 4 8] [--workers 2 4] [--queries 100]
+
+Each "session" is a thread ranking helper skill strings against the same
+``--tasks`` open tasks with ``k=10``, as concurrent Find Tasks reruns do.
+``workers 0`` is the in-process baseline (MaxScore search in the calling
+thread); other values route every search through a ScoringPool of that many
+processes. Reported per configuration: total queries per second across
+sessions and p50/p95 latency of a single query. Speed-ups need at least as
+many free cores as workers; on one core the pool only adds IPC overhead.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.corpus import generate_helpers, generate_tasks, make_zips
+from matching import PooledIndex, ScoringPool, make_index, rank_tasks_by_match
+
+TOP_N = 10
+
+
+def run_sessions(index, tasks, queries, sessions):
+    latencies = [[] for _ in range(sessions)]
+
+    def session(n):
+        for skills in queries[n::sessions]:
+            start = time.perf_counter()
+            rank_tasks_by_match(tasks, skills, index, k=TOP_N)
+            latencies[n].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = np.concatenate([np.array(l) for l in latencies]) * 1000
+    return {
+        "queries_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engines", nargs="+", default=["tfidf", "hashing"], choices=["tfidf", "hashing"])
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--sessions", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument("--workers", nargs="+", type=int, default=[2, 4])
+    parser.add_argument("--queries", type=int, default=100, help="queries per configuration, split over sessions")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    zips = make_zips(50, args.seed)
+    tasks = generate_tasks(args.tasks, args.seed, zips)
+    queries = [h[3] for h in generate_helpers(args.queries, args.seed, zips)]
+    results = {}
+    for engine in args.engines:
+        index = make_index(engine)
+        index.add(tasks)
+        results[engine] = {}
+        for workers in [0] + args.workers:
+            pool = ScoringPool(workers, min_tasks=0) if workers else None
+            searched = PooledIndex(index, pool) if pool else index
+            run_sessions(searched, tasks, queries[:workers + 1], workers + 1)  # start workers, write snapshot
+            for sessions in args.sessions:
+                results[engine][f"{workers}/{sessions}"] = run_sessions(searched, tasks, queries, sessions)
+            if pool:
+                pool.close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.tasks} tasks, {os.cpu_count()} CPUs")
+    print(f"{'engine':<9}{'workers':>8}{'sessions':>9}{'q/s':>9}{'p50 ms':>9}{'p95 ms':>9}")
+    for engine, configs in results.items():
+        for config, r in configs.items():
+            workers, sessions = config.split("/")
+            print(f"{engine:<9}{workers:>8}{sessions:>9}{r['queries_per_s']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Read/write throughput of each storage profile against a copy of data.db.
+
+    python -m benchmarks.bench_storage [--db data.db] [--seconds 3] [--readers 4]
+
+Each profile gets its own copy of the database (topped up with synthetic
+tasks if it is small), so the live data.db is never modified. Three phases
+run per profile: readers only, writer only, and readers while a writer is
+accepting tasks -- the case that used to serialize behind the rollback journal.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from config import DB_PATH
+from db import STORAGE_PROFILES, ConnectionPool, migrate, read_counters
+
+CATEGORIES = ["Cleaning", "Errands", "Assembly", "Yardwork", "Tech Help", "Other"]
+
+
+def prepare_copy(src, dst, min_tasks, zips):
+    if os.path.exists(src):
+        shutil.copyfile(src, dst)
+    pool = ConnectionPool(dst, size=1, profile="sqlite_default")
+    with pool.writer() as conn:
+        migrate(conn)
+        have = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+        now = datetime.utcnow().isoformat()
+        conn.executemany(
+            "INSERT INTO tasks (title, description, category, price, zip, status, posted_by, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, 'Open', 1, ?, ?)",
+            [
+                (f"Task {i}", f"Synthetic task number {i}", random.choice(CATEGORIES), "$20",
+                 random.choice(zips), now, now)
+                for i in range(max(0, min_tasks - have))
+            ],
+        )
+    pool.close()
+
+
+def read_op(pool, zips):
+    with pool.reader() as conn:
+        conn.execute(
+            "SELECT * FROM tasks WHERE status='Open' AND zip=? AND category=? ORDER BY id DESC",
+            (random.choice(zips), random.choice(CATEGORIES)),
+        ).fetchall()
+        read_counters(conn)
+
+
+def write_op(pool, zips):
+    now = datetime.utcnow().isoformat()
+    with pool.writer() as conn:
+        cur = conn.execute(
+            "INSERT INTO tasks (title, description, category, price, zip, status, posted_by, created_at, updated_at) "
+            "VALUES ('Bench', 'Benchmark write', 'Other', '$5', ?, 'Open', 1, ?, ?)",
+            (random.choice(zips), now, now),
+        )
+        conn.execute(
+            "UPDATE tasks SET status='Accepted', accepted_by=1, updated_at=? WHERE id=? AND status='Open'",
+            (now, cur.lastrowid),
+        )
+
+
+def run_phase(pool, zips, seconds, readers, writers):
+    counts = {"reads": 0, "writes": 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def loop(op, key):
+        n = 0
+        while time.perf_counter() < stop:
+            op(pool, zips)
+            n += 1
+        with lock:
+            counts[key] += n
+
+    threads = [threading.Thread(target=loop, args=(read_op, "reads")) for _ in range(readers)]
+    threads += [threading.Thread(target=loop, args=(write_op, "writes")) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {k: round(v / seconds, 1) for k, v in counts.items()}
+
+
+def bench_profile(profile, args, zips, workdir):
+    path = os.path.join(workdir, f"{profile}.db")
+    prepare_copy(args.db, path, args.min_tasks, zips)
+    pool = ConnectionPool(path, size=args.readers, profile=profile)
+    try:
+        return {
+            "read_only": run_phase(pool, zips, args.seconds, args.readers, 0)["reads"],
+            "write_only": run_phase(pool, zips, args.seconds, 0, 1)["writes"],
+            "mixed": run_phase(pool, zips, args.seconds, args.readers, 1),
+        }
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DB_PATH, help="database to copy (default: %(default)s)")
+    parser.add_argument("--profiles", nargs="+", default=list(STORAGE_PROFILES), choices=list(STORAGE_PROFILES))
+    parser.add_argument("--seconds", type=float, default=3.0, help="duration of each phase")
+    parser.add_argument("--readers", type=int, default=4, help="concurrent reader threads")
+    parser.add_argument("--min-tasks", type=int, default=5000, help="top the copy up to this many tasks")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    random.seed(7)
+    zips = [f"94{n:03d}" for n in range(100, 160)]
+    workdir = tempfile.mkdtemp(prefix="neardoer-bench-")
+    try:
+        results = {p: bench_profile(p, args, zips, workdir) for p in args.profiles}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'profile':<16}{'reads/s':>10}{'writes/s':>10}{'mixed r/s':>11}{'mixed w/s':>11}")
+    for profile, r in results.items():
+        print(f"{profile:<16}{r['read_only']:>10}{r['write_only']:>10}"
+              f"{r['mixed']['reads']:>11}{r['mixed']['writes']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Synthetic NearDoer tasks and helpers for benchmarks and evaluation.
+
+Rows have the same shape as the app's: tasks match ``app.TASK_COLUMNS``
+(id, title, description, category, price, zip, status, posted_by,
+accepted_by, created_at, updated_at) and helpers are (id, name, zip, skills).
+Everything is driven by a seeded ``random.Random``, so a given seed always
+yields the same corpus.
+"""
+import random
+from datetime import datetime, timedelta
+
+CATEGORIES = ["Cleaning", "Errands", "Assembly", "Yardwork", "Tech Help", "Other"]
+
+# Per category: title templates, description sentences, and the skill words a
+# helper who does this kind of work would list.
+TEMPLATES = {
+    "Cleaning": (
+        ["Deep clean {room}", "Move-out cleaning for {size} apartment", "Clean {room} before guests arrive",
+         "Window washing", "Carpet and rug cleaning", "Weekly house cleaning"],
+        ["Need someone to scrub the {room} and mop the floors.", "Bring your own supplies if possible.",
+         "Oven, fridge and cabinets inside too.", "About {hours} hours of work.", "Pet-friendly products please."],
+        ["cleaning", "deep clean", "housekeeping", "mopping", "vacuum", "windows", "laundry", "organizing"],
+    ),
+    "Errands": (
+        ["Grocery pickup from {store}", "Drop off package at post office", "Pick up prescription",
+         "Return items to {store}", "Dog walking this week", "Wait in line for permit office"],
+        ["List will be sent after accepting.", "Car needed, short drive.", "Must arrive before {time}.",
+         "Friendly dog, about {hours} walks.", "Receipts please, I will reimburse."],
+        ["errands", "groceries", "delivery", "driving", "dog walking", "pet sitting", "shopping", "pickup"],
+    ),
+    "Assembly": (
+        ["Assemble IKEA {furniture}", "Put together {furniture}", "Mount TV on wall",
+         "Build kids bunk bed", "Assemble office desk and chair", "Install shelves"],
+        ["All parts and instructions are here.", "Drill needed for wall anchors.", "Second floor, no elevator.",
+         "Should take about {hours} hours.", "Flat-pack {furniture} from IKEA."],
+        ["furniture assembly", "ikea", "handyman", "tv mounting", "drill", "shelves", "carpentry", "tools"],
+    ),
+    "Yardwork": (
+        ["Mow the lawn", "Rake leaves in {yard}", "Trim hedges and bushes", "Weed the garden beds",
+         "Plant flowers in {yard}", "Clean gutters"],
+        ["Mower and tools provided.", "Yard is about {size} size.", "Bag the clippings for green bin.",
+         "Ladder available for gutters.", "About {hours} hours outside."],
+        ["lawn mowing", "gardening", "yardwork", "landscaping", "weeding", "hedge trimming", "gutters", "planting"],
+    ),
+    "Tech Help": (
+        ["Set up new {device}", "Fix slow wifi", "Install printer drivers", "Move photos to new phone",
+         "Help parent with {device}", "Set up smart home hub"],
+        ["Router is in the living room.", "Patience appreciated, not very techy.", "Windows and Mac at home.",
+         "Backup important files first.", "Should take {hours} hours or less."],
+        ["tech support", "wifi", "computers", "printer setup", "smartphones", "networking", "windows", "mac"],
+    ),
+    "Other": (
+        ["Help moving boxes", "Paint {room} wall", "Tutor for {subject} homework", "Photograph small event",
+         "Sew a torn curtain", "Help set up garage sale"],
+        ["Heavy lifting involved.", "Paint and rollers provided.", "Two sessions a week.",
+         "Flexible timing on the weekend.", "About {hours} hours."],
+        ["moving", "painting", "tutoring", "photography", "sewing", "heavy lifting", "math", "events"],
+    ),
+}
+FILLERS = {
+    "room": ["kitchen", "bathroom", "living room", "garage", "bedroom", "basement"],
+    "size": ["small", "medium", "large", "studio", "two-bedroom"],
+    "hours": ["1", "2", "3", "4", "half a day"],
+    "store": ["Target", "Costco", "Trader Joe's", "Home Depot", "the pharmacy"],
+    "time": ["noon", "5pm", "9am", "Friday"],
+    "furniture": ["dresser", "bookshelf", "wardrobe", "bed frame", "desk", "dining table"],
+    "yard": ["the backyard", "the front yard", "the side yard"],
+    "device": ["laptop", "iPhone", "smart TV", "tablet", "router"],
+    "subject": ["math", "chemistry", "Spanish", "essay writing"],
+}
+PRICE_FORMATS = ["${n}", "${n}", "${n}/hr", "{n} USD", "${n}-{m}", ""]
+
+
+def make_zips(n, seed=0):
+    rng = random.Random(seed)
+    return sorted({f"{rng.randint(10001, 99950):05d}" for _ in range(n * 2)})[:n]
+
+
+def _fill(rng, template):
+    return template.format(**{key: rng.choice(values) for key, values in FILLERS.items()})
+
+
+def generate_tasks(n, seed=0, zips=None, start_id=1, now=None):
+    """``n`` open tasks with realistic titles, descriptions, prices and ZIPs."""
+    rng = random.Random(seed)
+    zips = zips or make_zips(50, seed)
+    now = now or datetime(2026, 1, 1)
+    tasks = []
+    for i in range(n):
+        category = rng.choice(CATEGORIES)
+        titles, sentences, _ = TEMPLATES[category]
+        low = rng.choice([15, 20, 25, 30, 40, 60, 80, 120])
+        price = rng.choice(PRICE_FORMATS).format(n=low, m=low + 20)
+        created = (now - timedelta(minutes=rng.randint(0, 60 * 24 * 30))).isoformat()
+        tasks.append((
+            start_id + i,
+            _fill(rng, rng.choice(titles)),
+            " ".join(_fill(rng, s) for s in rng.sample(sentences, rng.randint(2, 4))),
+            category,
+            price,
+            rng.choice(zips),
+            "Open",
+            rng.randint(1, max(1, n // 10)),
+            None,
+            created,
+            created,
+        ))
+    return tasks
+
+
+def generate_helpers(n, seed=0, zips=None, start_id=1):
+    """``n`` helpers, each listing comma-separated skills from one or two categories."""
+    rng = random.Random(seed + 1)
+    zips = zips or make_zips(50, seed)
+    helpers = []
+    for i in range(n):
+        pool = [skill for c in rng.sample(CATEGORIES, rng.choice([1, 1, 2])) for skill in TEMPLATES[c][2]]
+        helpers.append((start_id + i, f"Helper {start_id + i}", rng.choice(zips), ", ".join(rng.sample(pool, 3))))
+    return helpers
+
+
+def accept_tasks(tasks, helpers, fraction=0.2, seed=0):
+    """Copy of ``tasks`` with about ``fraction`` accepted by a helper from the task's ZIP.
+
+    The helper is one whose skills include a word of the task's category;
+    tasks without such a helper stay open. Acceptance is 1-72 hours after
+    posting and recorded in updated_at, as accept_task does.
+    """
+    rng = random.Random(seed + 2)
+    fits = {}  # (zip, category) -> ids of helpers listing one of its skills
+    for hid, _, zip_code, skills in helpers:
+        listed = set(skills.split(", "))
+        for category, (_, _, words) in TEMPLATES.items():
+            if listed & set(words):
+                fits.setdefault((zip_code, category), []).append(hid)
+    accepted = []
+    for task in tasks:
+        candidates = fits.get((task[5], task[3]))
+        if candidates and rng.random() < fraction:
+            at = (datetime.fromisoformat(task[9]) + timedelta(hours=rng.randint(1, 72))).isoformat()
+            task = task[:6] + ("Accepted", task[7], rng.choice(candidates), task[9], at)
+        accepted.append(task)
+    return accepted
+
+
+def seed_database(conn, tasks=(), helpers=()):
+    """Insert generated rows (ids included) with the writer connection."""
+    conn.executemany(
+        "INSERT INTO users (id, name, role, zip, skills) VALUES (?, ?, 'Helper', ?, ?)", helpers
+    )
+    conn.executemany(
+        "INSERT INTO tasks (id, title, description, category, price, zip, status, posted_by, accepted_by,"
+        " created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        tasks,
+    )
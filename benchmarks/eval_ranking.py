@@ -0,0 +1,141 @@
+"""Offline ranking quality and latency of each match engine, replayed from accept history.
+
+    python -m benchmarks.eval_ranking [--db data.db] [--engines tfidf chargram] [--k 5 10]
+                                      [--tasks 20000] [--synonym-weight 0.3] [--json]
+
+Every task with ``accepted_by`` set is one replay: the accepting helper's
+skills are ranked with ``rank_tasks_by_match`` against the tasks that were
+open in that task's ZIP when it was accepted, and the accepted task is the
+one relevant result. With a single relevant task NDCG@k is
+``1 / log2(rank + 1)`` when it is ranked within k (0 otherwise) and
+recall@k is whether it is; MRR is taken over the deepest k. Ranking latency
+(p50/p95) is timed per replay, so a faster engine can be judged on both
+axes. The ``newest`` row is the unranked list the app shows without skills.
+
+History comes from ``--db`` (opened read-only), or without one from a
+synthetic corpus in which helpers accept tasks of their own categories in
+their ZIP. Accepted and completed tasks only record their last status change
+(``updated_at``), so a completed task counts as open until it was completed:
+replays can see slightly more candidates than the helper did. IDF is taken
+over the whole history, including tasks posted after a replay.
+"""
+import argparse
+import json
+import math
+import sqlite3
+import time
+
+import numpy as np
+
+from benchmarks.bench_matching import build
+from benchmarks.corpus import accept_tasks, generate_helpers, generate_tasks, make_zips
+from matching import ENGINES, SynonymMap, rank_tasks_by_match
+
+TASK_COLUMNS = "id, title, description, category, price, zip, status, posted_by, accepted_by, created_at, updated_at"
+
+
+def load_history(path):
+    """(every task, accepting helpers by id) from the database at ``path``."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        tasks = conn.execute(f"SELECT {TASK_COLUMNS} FROM tasks ORDER BY id").fetchall()
+        helpers = {row[0]: row for row in conn.execute(
+            "SELECT id, name, zip, skills FROM users WHERE id IN (SELECT accepted_by FROM tasks)"
+        )}
+    finally:
+        conn.close()
+    return tasks, helpers
+
+
+def synthetic_history(n, seed):
+    zips = make_zips(50, seed)
+    helpers = generate_helpers(max(1, n // 20), seed, zips)
+    return accept_tasks(generate_tasks(n, seed, zips), helpers, seed=seed), {h[0]: h for h in helpers}
+
+
+def replays(tasks, helpers):
+    """``(skills, accepted task id, candidates)`` per accepted task whose helper lists skills.
+
+    Candidates were posted by the time of acceptance and not closed before
+    it, newest first as fetch_open_tasks returns them.
+    """
+    by_zip = {}
+    for task in sorted(tasks, key=lambda t: -t[0]):
+        by_zip.setdefault(task[5], []).append(task)
+    cases = []
+    for task in tasks:
+        helper = helpers.get(task[8])
+        if helper is None or not helper[3]:
+            continue
+        at = task[10]
+        candidates = [t for t in by_zip[task[5]] if t[9] <= at and (t[6] == "Open" or t[10] >= at)]
+        cases.append((helper[3], task[0], candidates))
+    return cases
+
+
+def summarize(ranks, ks, latencies=None):
+    """Metrics from the accepted task's 1-based rank per replay (None: not in the top max(ks))."""
+    result = {"replays": len(ranks)}
+    for k in ks:
+        result[f"ndcg@{k}"] = round(float(np.mean([1 / math.log2(r + 1) if r and r <= k else 0.0 for r in ranks])), 4)
+        result[f"recall@{k}"] = round(float(np.mean([bool(r and r <= k) for r in ranks])), 4)
+    result["mrr"] = round(float(np.mean([1 / r if r else 0.0 for r in ranks])), 4)
+    if latencies is not None:
+        result["p50_ms"] = round(float(np.percentile(latencies, 50)) * 1000, 3)
+        result["p95_ms"] = round(float(np.percentile(latencies, 95)) * 1000, 3)
+    return result
+
+
+def _rank_of(target, ids):
+    return ids.index(target) + 1 if target in ids else None
+
+
+def evaluate(index, cases, ks):
+    depth = max(ks)
+    ranks, latencies = [], []
+    for skills, target, candidates in cases:
+        start = time.perf_counter()
+        ranked = rank_tasks_by_match(candidates, skills, index, k=depth)
+        latencies.append(time.perf_counter() - start)
+        ranks.append(_rank_of(target, [t[0] for t, _ in ranked]))
+    return summarize(ranks, ks, np.array(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="SQLite database with accept history (default: synthetic corpus)")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument("--k", nargs="+", type=int, default=[5, 10], help="cutoffs for NDCG and recall")
+    parser.add_argument("--tasks", type=int, default=20000, help="synthetic corpus size")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--synonym-weight", type=float, default=0.3,
+                        help="skill synonym expansion for word engines, as MATCH_SYNONYM_WEIGHT (0 disables)")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    tasks, helpers = load_history(args.db) if args.db else synthetic_history(args.tasks, args.seed)
+    cases = replays(tasks, helpers)
+    if not cases:
+        parser.exit(1, "no accepted tasks with a helper's skills to replay\n")
+
+    depth = max(args.k)
+    results = {"newest": summarize([_rank_of(target, [t[0] for t in c[:depth]]) for _, target, c in cases], args.k)}
+    synonyms = SynonymMap.load(weight=args.synonym_weight) if args.synonym_weight > 0 else None
+    for engine in args.engines:
+        index = build(engine, tasks)
+        if engine != "chargram":
+            getattr(index, "base", index).synonyms = synonyms
+        evaluate(index, cases[:5], args.k)  # warm caches (postings, idf, projections)
+        results[engine] = evaluate(index, cases, args.k)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    metrics = [key for key in results[args.engines[-1]] if key != "replays"]
+    print(f"{'engine':<9}{'replays':>8}" + "".join(f"{key:>11}" for key in metrics))
+    for engine, r in results.items():
+        print(f"{engine:<9}{r['replays']:>8}" + "".join(f"{r.get(key, ''):>11}" for key in metrics))
+
+
+if __name__ == "__main__":
+    main()
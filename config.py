@@ -0,0 +1,51 @@
+"""Deployment settings.
+
+Every value can be overridden with a ``NEARDOER_<NAME>`` environment variable
+(on Streamlit Cloud, root-level secrets are exported as environment variables).
+"""
+import os
+
+
+def _env(name, default):
+    return os.environ.get(f"NEARDOER_{name}", default)
+
+
+def _env_int(name, default):
+    return int(_env(name, default))
+
+
+def _env_float(name, default):
+    return float(_env(name, default))
+
+
+# -------------------------
+# Database
+# -------------------------
+DB_PATH = _env("DB_PATH", "data.db")
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 4)          # reader connections per process
+DB_POOL_TIMEOUT = _env_float("DB_POOL_TIMEOUT", 10)  # seconds to wait for a free connection
+STORAGE_PROFILE = _env("STORAGE_PROFILE", "tuned")  # key of db.STORAGE_PROFILES
+
+
+# -------------------------
+# Matching
+# -------------------------
+MATCH_ENGINE = _env("MATCH_ENGINE", "tfidf")  # key of matching.ENGINES
+MATCH_MAX_SHARDS = _env_int("MATCH_MAX_SHARDS", 256)  # per-ZIP/category indexes kept in memory
+MATCH_SYNONYM_WEIGHT = _env_float("MATCH_SYNONYM_WEIGHT", 0.3)  # related skill terms; 0 disables expansion
+MATCH_CACHE_SIZE = _env_int("MATCH_CACHE_SIZE", 1024)   # ranked results kept per process
+MATCH_CACHE_TTL = _env_float("MATCH_CACHE_TTL", 60)     # seconds before a cached ranking is recomputed
+MATCH_WORKERS = _env_int("MATCH_WORKERS", 0)            # scoring processes; 0 scores in the session thread
+MATCH_POOL_MIN_TASKS = _env_int("MATCH_POOL_MIN_TASKS", 20000)  # smaller candidate sets stay in-process
+MATCH_SNAPSHOT_DIR = _env("MATCH_SNAPSHOT_DIR", "match_snapshot")  # memory-mapped open tasks; "" disables
+MATCH_SNAPSHOT_MAX_LAG = _env_int("MATCH_SNAPSHOT_MAX_LAG", 1000)  # task changes before it is rewritten
+MATCH_DUPLICATE_THRESHOLD = _env_float("MATCH_DUPLICATE_THRESHOLD", 0.8)  # near-duplicate similarity; 0 disables
+# Hybrid ranking: relative weight of each component. Off by default (text
+# only, which keeps the pruned and pooled text-match paths); any non-zero
+# distance, price or recency weight blends that component in.
+MATCH_WEIGHTS = {
+    "text": _env_float("MATCH_WEIGHT_TEXT", 1.0),
+    "distance": _env_float("MATCH_WEIGHT_DISTANCE", 0.0),   # closer ZIP centroid
+    "price": _env_float("MATCH_WEIGHT_PRICE", 0.0),         # better paid than the other candidates
+    "recency": _env_float("MATCH_WEIGHT_RECENCY", 0.0),     # posted recently
+}
@@ -0,0 +1,453 @@
+"""SQLite access shared by every Streamlit session in a server process."""
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# -------------------------
+# Storage profiles
+# -------------------------
+# PRAGMAs applied, in order, to every connection. busy_timeout goes first so
+# the journal_mode switch waits out other connections instead of failing.
+STORAGE_PROFILES = {
+    # SQLite's out-of-the-box behaviour: rollback journal, fsync on every commit.
+    "sqlite_default": {
+        "busy_timeout": 5000,
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+    },
+    # Readers no longer block behind a writer; commits skip the per-txn fsync.
+    "wal": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+    },
+    # WAL plus a 64 MiB page cache, memory-mapped reads and in-memory temp tables.
+    "tuned": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def storage_pragmas(profile):
+    """The PRAGMA settings of a ``STORAGE_PROFILES`` entry; ValueError for unknown names."""
+    try:
+        return STORAGE_PROFILES[profile]
+    except KeyError:
+        raise ValueError(
+            f"unknown storage profile {profile!r}; choose from {', '.join(STORAGE_PROFILES)}"
+        ) from None
+
+
+def connect(path, profile="tuned"):
+    return _open(path, storage_pragmas(profile))
+
+
+def _open(path, pragmas):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+# -------------------------
+# Schema migrations
+# -------------------------
+# Recomputes the counters row from scratch (migration 3 and `repair-counters`).
+RECOUNT_SQL = """
+    UPDATE counters SET
+        users = (SELECT COUNT(*) FROM users),
+        tasks = (SELECT COUNT(*) FROM tasks),
+        open = (SELECT COUNT(*) FROM tasks WHERE status = 'Open'),
+        accepted = (SELECT COUNT(*) FROM tasks WHERE status = 'Accepted'),
+        completed = (SELECT COUNT(*) FROM tasks WHERE status = 'Completed')
+    WHERE id = 1
+"""
+
+# MIGRATIONS[n] upgrades the schema from version n to n + 1 and PRAGMA
+# user_version records how many have run. Each entry is a tuple of SQL
+# statements or a callable taking the connection. Only ever append.
+MIGRATIONS = [
+    # 1: base tables. IF NOT EXISTS lets databases created before versioning adopt it.
+    (
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            role TEXT NOT NULL CHECK(role IN ('Poster','Helper')),
+            zip TEXT,
+            skills TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            category TEXT,
+            price TEXT,
+            zip TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Open' CHECK(status IN ('Open','Accepted','Completed')),
+            posted_by INTEGER,
+            accepted_by INTEGER,
+            created_at TEXT,
+            updated_at TEXT,
+            FOREIGN KEY(posted_by) REFERENCES users(id),
+            FOREIGN KEY(accepted_by) REFERENCES users(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS testimonials (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            role TEXT NOT NULL,
+            quote TEXT NOT NULL,
+            created_at TEXT
+        )
+        """,
+    ),
+    # 2: indexes for the hot lookups. The users index covers get_or_create_user
+    # outright (id is the rowid); the partial indexes hold only open tasks and
+    # return them already in "ORDER BY id DESC" order per zip / zip + category.
+    (
+        "CREATE INDEX IF NOT EXISTS idx_users_name_role_zip ON users(name, role, zip)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_open_zip ON tasks(zip, id) WHERE status='Open'",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_open_zip_category ON tasks(zip, category, id) WHERE status='Open'",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_posted_by ON tasks(posted_by, id)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_accepted_by ON tasks(accepted_by, id)",
+    ),
+    # 3: single-row counters kept exact by triggers, so the stats banner is one
+    # primary-key read instead of four COUNT(*) scans.
+    (
+        """
+        CREATE TABLE counters (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            users INTEGER NOT NULL DEFAULT 0,
+            tasks INTEGER NOT NULL DEFAULT 0,
+            open INTEGER NOT NULL DEFAULT 0,
+            accepted INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "INSERT INTO counters (id) VALUES (1)",
+        """
+        CREATE TRIGGER counters_users_insert AFTER INSERT ON users BEGIN
+            UPDATE counters SET users = users + 1 WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER counters_users_delete AFTER DELETE ON users BEGIN
+            UPDATE counters SET users = users - 1 WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER counters_tasks_insert AFTER INSERT ON tasks BEGIN
+            UPDATE counters SET
+                tasks = tasks + 1,
+                open = open + (NEW.status = 'Open'),
+                accepted = accepted + (NEW.status = 'Accepted'),
+                completed = completed + (NEW.status = 'Completed')
+            WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER counters_tasks_delete AFTER DELETE ON tasks BEGIN
+            UPDATE counters SET
+                tasks = tasks - 1,
+                open = open - (OLD.status = 'Open'),
+                accepted = accepted - (OLD.status = 'Accepted'),
+                completed = completed - (OLD.status = 'Completed')
+            WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER counters_tasks_status AFTER UPDATE OF status ON tasks
+        WHEN OLD.status IS NOT NEW.status BEGIN
+            UPDATE counters SET
+                open = open + (NEW.status = 'Open') - (OLD.status = 'Open'),
+                accepted = accepted + (NEW.status = 'Accepted') - (OLD.status = 'Accepted'),
+                completed = completed + (NEW.status = 'Completed') - (OLD.status = 'Completed')
+            WHERE id = 1;
+        END
+        """,
+        RECOUNT_SQL,
+    ),
+    # 4: persisted task vectors. terms is the append-only TF-IDF vocabulary
+    # (term id = matrix column); tasks.vector holds the task's term counts
+    # in that space, written by create_task (see matching.encode_vector).
+    (
+        "CREATE TABLE terms (id INTEGER PRIMARY KEY, term TEXT NOT NULL UNIQUE)",
+        "ALTER TABLE tasks ADD COLUMN vector BLOB",
+    ),
+    # 5: corpus version, bumped whenever a task is posted, deleted or has its
+    # status or content changed, so caches of ranked tasks can tell they are stale.
+    (
+        "ALTER TABLE counters ADD COLUMN corpus_version INTEGER NOT NULL DEFAULT 0",
+        """
+        CREATE TRIGGER corpus_version_tasks_insert AFTER INSERT ON tasks BEGIN
+            UPDATE counters SET corpus_version = corpus_version + 1 WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER corpus_version_tasks_delete AFTER DELETE ON tasks BEGIN
+            UPDATE counters SET corpus_version = corpus_version + 1 WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER corpus_version_tasks_update
+        AFTER UPDATE OF status, title, description, category, price, zip ON tasks BEGIN
+            UPDATE counters SET corpus_version = corpus_version + 1 WHERE id = 1;
+        END
+        """,
+    ),
+    # 6: near-duplicate detection. tasks.minhash holds the task's MinHash
+    # signature and task_lsh its LSH buckets (see matching.lsh_keys), written
+    # by create_task; duplicate_of points a flagged task at the open task it
+    # resembles.
+    (
+        "ALTER TABLE tasks ADD COLUMN minhash BLOB",
+        "ALTER TABLE tasks ADD COLUMN duplicate_of INTEGER",
+        "CREATE TABLE task_lsh (key INTEGER NOT NULL, task_id INTEGER NOT NULL, PRIMARY KEY (key, task_id)) WITHOUT ROWID",
+    ),
+    # 7: random database id, so files derived from one database (task
+    # snapshots) are not mistaken for another's, or a recreated one's.
+    (
+        "ALTER TABLE counters ADD COLUMN database_id TEXT",
+        "UPDATE counters SET database_id = lower(hex(randomblob(16))) WHERE id = 1",
+    ),
+]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply pending MIGRATIONS, one transaction each; returns the schema version.
+
+    The version is re-read under the write lock, so several server processes
+    starting at once each apply a given step at most once between them. A
+    transaction already open on ``conn`` (a ``ConnectionPool.writer``
+    checkout) is committed first and reopened afterwards.
+    """
+    held = conn.in_transaction
+    if held:
+        conn.commit()
+    for target in range(schema_version(conn) + 1, len(MIGRATIONS) + 1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if schema_version(conn) < target:
+                step = MIGRATIONS[target - 1]
+                if callable(step):
+                    step(conn)
+                else:
+                    for statement in step:
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    if held:
+        conn.execute("BEGIN IMMEDIATE")
+    return schema_version(conn)
+
+
+COUNTER_NAMES = ("users", "tasks", "open", "accepted", "completed")
+
+
+def read_counters(conn):
+    row = conn.execute(f"SELECT {', '.join(COUNTER_NAMES)} FROM counters WHERE id = 1").fetchone()
+    return dict(zip(COUNTER_NAMES, row))
+
+
+def corpus_version(conn):
+    return conn.execute("SELECT corpus_version FROM counters WHERE id = 1").fetchone()[0]
+
+
+def database_id(conn):
+    return conn.execute("SELECT database_id FROM counters WHERE id = 1").fetchone()[0]
+
+
+def repair_counters(conn):
+    """Recount from the base tables (e.g. after editing data.db by hand); returns the new values."""
+    conn.execute("INSERT OR IGNORE INTO counters (id) VALUES (1)")
+    conn.execute(RECOUNT_SQL)
+    return read_counters(conn)
+
+
+# -------------------------
+# Connection pool
+# -------------------------
+class ConnectionPool:
+    """Up to ``size`` reader connections plus one dedicated writer.
+
+    SQLite only admits one writer at a time, so writes queue on a lock in
+    front of a single connection instead of fighting over the database lock.
+    Readers are opened lazily and reused most-recently-returned first.
+    """
+
+    def __init__(self, path, size=4, timeout=10.0, profile="tuned"):
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        self.path = path
+        self.profile = profile
+        self._pragmas = storage_pragmas(profile)  # checked here: connections open lazily
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._writer = None
+        self._write_lock = threading.Lock()
+        self._stats = {
+            "reader_checkouts": 0,
+            "writer_checkouts": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "in_use": 0,
+            "peak_in_use": 0,
+        }
+
+    def _record_checkout(self, kind, waited):
+        with self._lock:
+            self._stats[f"{kind}_checkouts"] += 1
+            if waited is not None:
+                self._stats["waits"] += 1
+                self._stats["wait_seconds"] += waited
+            self._stats["in_use"] += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._stats["in_use"])
+
+    def _record_checkin(self):
+        with self._lock:
+            self._stats["in_use"] -= 1
+
+    def _acquire_reader(self):
+        try:
+            return self._idle.get_nowait(), None
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return _open(self.path, self._pragmas), None
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"no database connection free after {self.timeout}s") from None
+        return conn, time.perf_counter() - start
+
+    @contextmanager
+    def reader(self):
+        """Borrow a connection for SELECTs; it goes back to the pool on exit."""
+        conn, waited = self._acquire_reader()
+        self._record_checkout("reader", waited)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+            self._record_checkin()
+
+    @contextmanager
+    def writer(self):
+        """Hold the writer connection inside ``BEGIN IMMEDIATE``; commits on success, rolls back on error.
+
+        The transaction takes SQLite's write lock before the block's first
+        read, so read-then-write sequences (term ids, get-or-create) are atomic
+        across server processes, not just across this pool's threads.
+        """
+        start = time.perf_counter()
+        if not self._write_lock.acquire(timeout=self.timeout):
+            raise TimeoutError(f"writer connection still busy after {self.timeout}s")
+        waited = time.perf_counter() - start
+        try:
+            if self._writer is None:
+                self._writer = _open(self.path, self._pragmas)
+            self._record_checkout("writer", waited if waited > 0.001 else None)
+            try:
+                self._writer.execute("BEGIN IMMEDIATE")
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+            finally:
+                self._record_checkin()
+        finally:
+            self._write_lock.release()
+
+    def metrics(self):
+        """Checkout counters plus how many reader connections are open / idle."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["readers_open"] = self._opened
+        stats["readers_idle"] = self._idle.qsize()
+        stats["size"] = self.size
+        stats["profile"] = self.profile
+        return stats
+
+    def close(self):
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._opened -= 1
+
+
+# -------------------------
+# Command line
+# -------------------------
+def main(argv=None):
+    import argparse
+
+    from config import DB_PATH, STORAGE_PROFILE
+
+    parser = argparse.ArgumentParser(prog="python db.py", description="NearDoer database maintenance")
+    parser.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="apply pending schema migrations")
+    sub.add_parser("repair-counters", help="recompute the stats counters from the base tables")
+    args = parser.parse_args(argv)
+
+    pool = ConnectionPool(args.db, size=1, profile=STORAGE_PROFILE)
+    try:
+        if args.command == "migrate":
+            with pool.writer() as conn:
+                before = schema_version(conn)
+                after = migrate(conn)
+            print(f"schema version {before} -> {after}")
+        elif args.command == "repair-counters":
+            with pool.writer() as conn:
+                migrate(conn)
+                before = read_counters(conn)
+                after = repair_counters(conn)
+            for name in COUNTER_NAMES:
+                print(f"{name:<10}{before[name]:>8} -> {after[name]}")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""ZIP code centroids and nearby-ZIP lookups, fully offline.
+
+data/zip_centroids.csv.gz holds one ``zip,lat,lon`` row per US ZIP code
+(~42k, taken from the MIT-licensed ``zipcodes`` package dataset).
+"""
+import gzip
+import os
+
+import numpy as np
+from sklearn.neighbors import BallTree
+
+CENTROIDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "zip_centroids.csv.gz")
+EARTH_RADIUS_MILES = 3958.8
+
+
+def normalize_zip(zip_code):
+    # "94110-1234" / " 94110" -> "94110"
+    return (zip_code or "").strip()[:5]
+
+
+class ZipIndex:
+    """ZIP centroids as parallel arrays plus a haversine BallTree over them."""
+
+    def __init__(self, zips, lat, lon):
+        self.zips = np.asarray(zips)
+        self.coords = np.radians(np.column_stack([lat, lon]))
+        self._row = {z: i for i, z in enumerate(self.zips.tolist())}
+        self._tree = BallTree(self.coords, metric="haversine")
+
+    @classmethod
+    def load(cls, path=CENTROIDS_PATH):
+        with gzip.open(path, "rt") as f:
+            next(f)  # header
+            zips, lat, lon = zip(*(line.rstrip("\n").split(",") for line in f))
+        return cls(zips, np.array(lat, dtype=float), np.array(lon, dtype=float))
+
+    def __len__(self):
+        return len(self.zips)
+
+    def __contains__(self, zip_code):
+        return normalize_zip(zip_code) in self._row
+
+    def location(self, zip_code):
+        """``(lat, lon)`` in degrees, or None for an unknown ZIP."""
+        row = self._row.get(normalize_zip(zip_code))
+        return None if row is None else tuple(np.degrees(self.coords[row]))
+
+    def nearby(self, zip_code, miles):
+        """ZIPs whose centroid is within ``miles`` of ``zip_code``'s, nearest first.
+
+        Always starts with ``zip_code`` itself, exactly as given, so an
+        unknown ZIP (or a zero radius) falls back to an exact match.
+        """
+        row = self._row.get(normalize_zip(zip_code))
+        if row is None or miles <= 0:
+            return [zip_code]
+        rows, _ = self._tree.query_radius(
+            self.coords[row:row + 1], r=miles / EARTH_RADIUS_MILES, return_distance=True, sort_results=True
+        )
+        found = [z for z in self.zips[rows[0]].tolist() if z != zip_code]
+        return [zip_code] + found
+
+    def radians(self, zip_codes):
+        """``(n, 2)`` lat/lon in radians, one row per ZIP; NaN rows for unknown ZIPs."""
+        rows = np.array([self._row.get(normalize_zip(z), -1) for z in zip_codes], dtype=np.intp)
+        coords = self.coords[rows] if len(rows) else np.zeros((0, 2))
+        coords[rows < 0] = np.nan
+        return coords
+
+
+def haversine_miles(origin, coords):
+    """Great-circle miles from ``origin`` (lat, lon radians) to each row of ``coords``."""
+    lat, lon = coords[:, 0], coords[:, 1]
+    a = np.sin((lat - origin[0]) / 2) ** 2 + np.cos(origin[0]) * np.cos(lat) * np.sin((lon - origin[1]) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
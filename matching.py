@@ -0,0 +1,1824 @@
+"""AI task matching: ranks open tasks against helper skills.
+
+Task text is indexed by one of the ``ENGINES`` (TF-IDF, feature hashing,
+LSA, character n-grams), optionally sharded per ZIP and warmed from an
+on-disk snapshot; large top-k searches can run in a worker pool. Text
+scores can be blended with distance, price and recency, and new tasks are
+checked for near-duplicates with MinHash/LSH.
+"""
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import re
+import shutil
+import string
+import tempfile
+import threading
+import time
+import weakref
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from typing import List
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from joblib import Parallel, delayed
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.preprocessing import normalize
+from sklearn.utils import murmurhash3_32
+
+from db import corpus_version, database_id
+from geo import haversine_miles
+
+# Tokenization shared by every word-level engine and by the stored vectors.
+WORD_ANALYZER = {"stop_words": "english", "ngram_range": (1, 2)}
+_analyze_words = TfidfVectorizer(**WORD_ANALYZER).build_analyzer()
+# Character n-grams inside word boundaries, for the typo-tolerant chargram engine.
+CHAR_ANALYZER = {"analyzer": "char_wb", "ngram_range": (3, 5)}
+_analyze_chars = TfidfVectorizer(**CHAR_ANALYZER).build_analyzer()
+
+
+def task_text(task):
+    # task is a tasks row: (id, title, description, category, ...)
+    return f"{task[1]} {task[2]} {task[3]}"
+
+
+# -------------------------
+# Stored vectors
+# -------------------------
+# tasks.vector blob: n little-endian int32 term ids followed by n float32 counts.
+# Term ids are rows of the append-only terms table, shared by every process.
+def encode_vector(indices, values):
+    return np.asarray(indices, dtype="<i4").tobytes() + np.asarray(values, dtype="<f4").tobytes()
+
+
+def decode_vector(blob):
+    n = len(blob) // 8
+    return np.frombuffer(blob, dtype="<i4", count=n), np.frombuffer(blob, dtype="<f4", offset=4 * n)
+
+
+def vectorize(conn, text):
+    """Stored-vector blob for ``text``, registering new terms in the terms table.
+
+    Call with the writer connection, in the same transaction that writes the
+    blob; its ``BEGIN IMMEDIATE`` keeps another process from taking the same
+    new ids between the lookup and the insert. Indexes learn the new term ids on their next ``sync``, after the
+    transaction has committed.
+    """
+    counts = Counter(_analyze_words(text))
+    terms = list(counts)
+    ids = {}
+    for start in range(0, len(terms), 500):
+        chunk = terms[start:start + 500]
+        ids.update(conn.execute(
+            f"SELECT term, id FROM terms WHERE term IN ({','.join('?' * len(chunk))})", chunk
+        ).fetchall())
+    missing = [term for term in terms if term not in ids]
+    if missing:
+        next_id = conn.execute("SELECT IFNULL(MAX(id) + 1, 0) FROM terms").fetchone()[0]
+        new_ids = {term: next_id + i for i, term in enumerate(missing)}
+        conn.executemany("INSERT INTO terms (id, term) VALUES (?, ?)", [(i, t) for t, i in new_ids.items()])
+        ids.update(new_ids)
+    return encode_vector([ids[term] for term in terms], [counts[term] for term in terms])
+
+
+def backfill_vectors(conn):
+    """Store vectors for tasks written before vectors existed (writer connection)."""
+    rows = conn.execute("SELECT id, title, description, category FROM tasks WHERE vector IS NULL").fetchall()
+    conn.executemany(
+        "UPDATE tasks SET vector=? WHERE id=?",
+        [(vectorize(conn, task_text(row)), row[0]) for row in rows],
+    )
+    return len(rows)
+
+
+def _open_tasks(conn, columns, after_id, zip_code=None, category=None):
+    # Open tasks with id > after_id, optionally one ZIP (and category); the
+    # partial idx_tasks_open_zip* indexes serve the scoped reads as range scans.
+    sql, params = f"SELECT {columns} FROM tasks WHERE id > ? AND status='Open'", [after_id]
+    if zip_code is not None:
+        sql += " AND zip=?"
+        params.append(zip_code)
+    if category is not None:
+        sql += " AND category=?"
+        params.append(category)
+    return conn.execute(sql + " ORDER BY id", params).fetchall()
+
+
+# -------------------------
+# Near-duplicate tasks
+# -------------------------
+# tasks.minhash blob: MINHASH_SIZE little-endian uint32 minimums, one per hash
+# function, over the task's analyzed terms. task_lsh holds one key per LSH
+# band (band number in the high bits, a hash of the band's minimums in the
+# low 32), so a task's candidate duplicates are MINHASH_BANDS primary-key
+# lookups however many tasks are stored. Rows of closed tasks are left in
+# place; lookups only join open tasks.
+MINHASH_SIZE = 64
+MINHASH_BANDS = 16  # 4 minimums each: pairs above ~0.5 Jaccard usually share a band
+# Multiply-add-shift hash functions (odd 64-bit multipliers). Fixed seed:
+# signatures are stored, so every process must draw the same functions.
+_minhash_bytes = np.random.default_rng(1847).bytes(16 * MINHASH_SIZE)
+_MINHASH_A = np.frombuffer(_minhash_bytes, dtype="<u8", count=MINHASH_SIZE) | np.uint64(1)
+_MINHASH_B = np.frombuffer(_minhash_bytes, dtype="<u8", offset=8 * MINHASH_SIZE)
+
+
+def minhash_signature(text):
+    """MinHash of the text's analyzed terms as uint32 minimums; None for text without terms."""
+    terms = set(_analyze_words(text))
+    if not terms:
+        return None
+    h = np.array([murmurhash3_32(term, positive=True) for term in terms], dtype=np.uint64)
+    # uint64 products wrap, as multiply-shift hashing intends; the high 32 bits are the hash.
+    hashed = (_MINHASH_A[:, None] * h + _MINHASH_B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1).astype("<u4")
+
+
+def decode_signature(blob):
+    return np.frombuffer(blob, dtype="<u4")
+
+
+def lsh_keys(signature):
+    """One task_lsh key per band of ``signature``."""
+    bands = signature.reshape(MINHASH_BANDS, -1)
+    return [band << 32 | int(murmurhash3_32(bands[band].tobytes(), seed=band, positive=True))
+            for band in range(MINHASH_BANDS)]
+
+
+def store_signature(conn, task_id, signature):
+    """Record a task's signature and LSH buckets (writer connection)."""
+    conn.execute("UPDATE tasks SET minhash=? WHERE id=?", (signature.tobytes(), task_id))
+    conn.executemany("INSERT OR IGNORE INTO task_lsh (key, task_id) VALUES (?, ?)",
+                     [(key, task_id) for key in lsh_keys(signature)])
+
+
+def find_near_duplicate(conn, signature, posted_by, zip_code, threshold=0.8):
+    """The open task from the same poster or ZIP that ``signature`` most resembles.
+
+    Candidates share at least one LSH band; each is confirmed by the share of
+    equal minimums, which estimates the Jaccard similarity of the two term
+    sets. Returns ``(task id, posted by, zip, title, price, similarity)`` for
+    the best candidate at or above ``threshold``, preferring the poster's own
+    task in the same ZIP, or None.
+    """
+    keys = lsh_keys(signature)
+    rows = conn.execute(f"""
+        SELECT DISTINCT t.id, t.posted_by, t.zip, t.title, t.price, t.minhash
+        FROM task_lsh l JOIN tasks t ON t.id = l.task_id
+        WHERE l.key IN ({",".join("?" * len(keys))}) AND t.status='Open' AND (t.posted_by=? OR t.zip=?)
+    """, [*keys, posted_by, zip_code]).fetchall()
+    best = None
+    for *task, blob in rows:
+        similarity = float(np.mean(decode_signature(blob) == signature))
+        if similarity >= threshold:
+            rank = (task[1] == posted_by and task[2] == zip_code, similarity, task[0])
+            if best is None or rank > best[0]:
+                best = rank, (*task, similarity)
+    return best and best[1]
+
+
+def backfill_signatures(conn):
+    """Store signatures for open tasks written before near-duplicate detection (writer connection)."""
+    rows = conn.execute(
+        "SELECT id, title, description, category FROM tasks WHERE minhash IS NULL AND status='Open'"
+    ).fetchall()
+    for row in rows:
+        signature = minhash_signature(task_text(row))
+        if signature is not None:
+            store_signature(conn, row[0], signature)
+    return len(rows)
+
+
+# -------------------------
+# Task snapshots
+# -------------------------
+# A snapshot is one directory per corpus version (v000000001234) holding the
+# open tasks' term counts as CSR arrays (data, indices, indptr), their ids,
+# the terms table (terms.npy: UTF-8, newline-separated) and meta.json.
+def write_task_snapshot(conn, directory):
+    """Write the open tasks' stored vectors as a new snapshot under ``directory``; returns its path.
+
+    Use a reader connection; everything is read in one transaction. Rows are
+    ordered by ZIP, category and id, so every shard is one contiguous slice.
+    """
+    conn.execute("BEGIN")
+    try:
+        version = corpus_version(conn)
+        synced_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM tasks").fetchone()[0]
+        terms = [term for (term,) in conn.execute("SELECT term FROM terms ORDER BY id")]
+        identity = _snapshot_identity(conn, len(terms))
+        rows = conn.execute(
+            "SELECT id, zip, category, vector FROM tasks WHERE status='Open' AND vector IS NOT NULL"
+            " ORDER BY zip, category, id"
+        ).fetchall()
+    finally:
+        conn.rollback()
+    decoded = [decode_vector(row[3]) for row in rows]
+    indptr = np.concatenate([[0], np.cumsum([len(ix) for ix, _ in decoded])]).astype(np.int64)
+    shards = []
+    for i, row in enumerate(rows):
+        if not shards or shards[-1][:2] != [row[1], row[2]]:
+            shards.append([row[1], row[2], i, i])
+        shards[-1][3] = i + 1
+    arrays = {
+        "data": np.concatenate([np.zeros(0)] + [vals for _, vals in decoded]).astype(np.float64),
+        "indices": np.concatenate([np.zeros(0, np.int32)] + [ix for ix, _ in decoded]).astype(np.int32),
+        "indptr": indptr,
+        "task_ids": np.array([row[0] for row in rows], dtype=np.int64),
+        "terms": np.frombuffer("\n".join(terms).encode(), dtype=np.uint8),
+    }
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"v{version:012d}")
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=directory)
+    meta = {
+        "version": version, "synced_id": synced_id, "n_terms": len(terms), "shards": shards,
+        "database_id": identity[0], "terms_digest": identity[1],
+    }
+    try:
+        for name, values in arrays.items():
+            np.save(os.path.join(staging, f"{name}.npy"), values)
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        if os.path.isdir(path) and _identity_of(TaskSnapshot.read_meta(path)) != identity:
+            shutil.rmtree(path, ignore_errors=True)  # this version number, but another database's
+        os.rename(staging, path)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.isdir(path):     # else another process wrote this version first
+            raise
+    # Keep this snapshot and the newest older one. A newer-numbered one can
+    # only come from another database. Processes still mapping a removed
+    # snapshot keep their pages after the unlink.
+    name = os.path.basename(path)
+    older = sorted(other for other in TaskSnapshot.versions(directory) if other < name)
+    for other in TaskSnapshot.versions(directory):
+        if other != name and other not in older[-1:]:
+            shutil.rmtree(os.path.join(directory, other), ignore_errors=True)
+    return path
+
+
+def _snapshot_identity(conn, n_terms):
+    # (database id, digest of term n_terms - 1). Terms are append-only with
+    # ids from 0, so a matching digest means the snapshot's terms are a prefix
+    # of this database's table.
+    row = conn.execute("SELECT term FROM terms WHERE id = ?", (n_terms - 1,)).fetchone() if n_terms else ("",)
+    return database_id(conn), row and hashlib.sha1(row[0].encode()).hexdigest()
+
+
+def _identity_of(meta):
+    return meta.get("database_id"), meta.get("terms_digest")
+
+
+class TaskSnapshot:
+    """A snapshot written by ``write_task_snapshot``, memory-mapped read-only.
+
+    Every server process maps the same files, so they share one copy of the
+    pages, and a shard loaded from it starts as views into them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.meta = meta = self.read_meta(path)
+        self.version = meta["version"]
+        self.synced_id = meta["synced_id"]        # every open task up to this id is in the snapshot
+        self.n_terms = meta["n_terms"]
+        self._data, self._indices, self._indptr, self._task_ids = (
+            np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in ("data", "indices", "indptr", "task_ids")
+        )
+        self._ranges = {(None, None): (0, len(self._task_ids))}   # (zip, category) -> row range
+        for zip_code, category, start, stop in meta["shards"]:
+            self._ranges[(zip_code, category)] = start, stop
+            lo, hi = self._ranges.get((zip_code, None), (start, stop))
+            self._ranges[(zip_code, None)] = min(lo, start), max(hi, stop)
+
+    def __len__(self):
+        return len(self._task_ids)
+
+    @staticmethod
+    def versions(directory):
+        """Names of the complete snapshots under ``directory``."""
+        try:
+            return [name for name in os.listdir(directory) if re.fullmatch(r"v\d{12}", name)]
+        except FileNotFoundError:
+            return []
+
+    @classmethod
+    def latest_version(cls, directory):
+        names = cls.versions(directory)
+        return int(max(names)[1:]) if names else None
+
+    @classmethod
+    def load(cls, directory):
+        """The newest snapshot under ``directory``, or None if there is none."""
+        names = cls.versions(directory)
+        return cls(os.path.join(directory, max(names))) if names else None
+
+    @staticmethod
+    def read_meta(path):
+        with open(os.path.join(path, "meta.json")) as f:
+            return json.load(f)
+
+    @classmethod
+    def latest_meta(cls, directory):
+        """meta.json of the newest snapshot under ``directory``, without mapping it; None if there is none."""
+        names = cls.versions(directory)
+        return cls.read_meta(os.path.join(directory, max(names))) if names else None
+
+    @staticmethod
+    def fits(conn, meta):
+        """Whether the snapshot described by ``meta`` was written from this database and is not ahead of it.
+
+        A snapshot from another database, or from an earlier ``data.db`` at the
+        same path, has a different database id or terms digest; loading its
+        vocabulary would misalign every term id.
+        """
+        return meta["version"] <= corpus_version(conn) and _identity_of(meta) == _snapshot_identity(
+            conn, meta["n_terms"]
+        )
+
+    def matches(self, conn):
+        return self.fits(conn, self.meta)
+
+    def terms(self):
+        """The terms table as of the snapshot, in id order."""
+        blob = np.load(os.path.join(self.path, "terms.npy"), mmap_mode="r")
+        return blob.tobytes().decode().split("\n") if self.n_terms else []
+
+    def rows(self, zip_code=None, category=None):
+        """``(task_ids, counts)`` of one shard's open tasks as views, or None if the scope isn't stored."""
+        if zip_code is None and category is not None:
+            return None  # a category across ZIPs is not one slice
+        lo, hi = self._ranges.get((zip_code, category), (0, 0))
+        start, stop = self._indptr[lo], self._indptr[hi]
+        # Same dtype as indices, or scipy would copy them to match.
+        indptr = (self._indptr[lo:hi + 1] - start).astype(self._indices.dtype)
+        counts = sp.csr_matrix(
+            (self._data[start:stop], self._indices[start:stop], indptr), shape=(hi - lo, self.n_terms), copy=False
+        )
+        return self._task_ids[lo:hi], counts
+
+
+# -------------------------
+# Skill synonyms
+# -------------------------
+SYNONYMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "skill_synonyms.json")
+
+
+class SynonymMap:
+    """Related skill terms as a sparse term-to-term matrix.
+
+    ``groups`` are lists of analyzed terms a helper would use interchangeably
+    ("ikea", "furniture", "flat pack"); each term of a group links to every
+    other one with ``weight``. An index projects the matrix onto its own
+    columns once, so expanding a query is a single sparse vector-matrix product.
+    """
+
+    def __init__(self, groups, weight=0.3):
+        self.weight = weight
+        self.terms = {}                       # term -> row/column of matrix
+        pairs = set()
+        for group in groups:
+            ids = [self.terms.setdefault(term.lower(), len(self.terms)) for term in group]
+            pairs.update((a, b) for a in ids for b in ids if a != b)
+        rows, cols = zip(*sorted(pairs)) if pairs else ((), ())
+        self.matrix = sp.csr_matrix(
+            (np.full(len(rows), float(weight)), (rows, cols)), shape=(len(self.terms), len(self.terms))
+        )
+
+    @classmethod
+    def load(cls, path=SYNONYMS_PATH, weight=0.3):
+        with open(path) as f:
+            return cls(json.load(f), weight)
+
+    def counts(self, terms):
+        """``(1, len(terms))`` row of the taxonomy terms among ``terms`` (a Counter)."""
+        known = [(self.terms[term], tf) for term, tf in terms.items() if term in self.terms]
+        return sp.csr_matrix(
+            ([tf for _, tf in known], [i for i, _ in known], [0, len(known)]), shape=(1, len(self.terms))
+        )
+
+    def expand(self, terms):
+        """``terms`` (a Counter) plus ``weight`` x count of every related term."""
+        extra = self.counts(terms) @ self.matrix
+        names = list(self.terms)
+        expanded = Counter(terms)
+        for i, tf in zip(extra.indices, extra.data):
+            expanded[names[i]] += tf
+        return expanded
+
+
+# -------------------------
+# Task indexes
+# -------------------------
+class SparseIndex:
+    """Raw term-count rows for the open tasks plus their live document frequencies.
+
+    Subclasses decide how text maps to feature ids (``_count_rows``,
+    ``_query_terms`` and ``_term_features``). Smooth IDF and L2
+    normalization, as TfidfVectorizer applies them, are recomputed lazily
+    after the open set changes.
+
+    When feature ids come from a space shared beyond this index (the
+    database's terms table, hash buckets), ``_column_of`` maps them to
+    columns handed out in order of first use, so the rows, df and idf are
+    only as wide as the terms this index's own tasks use.
+    """
+
+    use_idf = True
+    # Storage type of the count and weighted rows.
+    dtype = np.float64
+    # rank_tasks_by_match switches to the pruned search() path for top-k
+    # queries over at least this many candidate tasks.
+    prune_min_tasks = 5000
+    # Optional SynonymMap: queries also match terms related to their own.
+    synonyms = None
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._synced_id = 0                   # highest task id pulled by sync()
+        self._checked_version = None          # corpus version of the last closed-task check
+        self._counts = sp.csr_matrix((0, 0), dtype=self.dtype)
+        self._row_of = {}                     # task id -> row in _counts
+        self._live = np.zeros(0, dtype=bool)
+        self._df = np.zeros(0)
+        self._column_of = None                # feature id -> column; None: feature ids are columns
+        self._weighted = None                 # cached (idf, weighted rows), dropped on change
+        self._inverted = None                 # postings built from a given _weighted
+        self._synonym_columns = None          # (width, expansion to columns, expansion to unseen terms)
+
+    def __len__(self):
+        return len(self._row_of)
+
+    def __contains__(self, task_id):
+        return task_id in self._row_of
+
+    def task_ids(self):
+        with self._lock:
+            return list(self._row_of)
+
+    def _count_rows(self, texts):
+        raise NotImplementedError
+
+    def _query_terms(self, text):
+        """``(column or None, term frequency)`` per query term; None = unknown term."""
+        raise NotImplementedError
+
+    def _term_features(self, terms):
+        """Feature id of each analyzed term, -1 for terms without one."""
+        raise NotImplementedError
+
+    def term_columns(self, terms):
+        """Column of each analyzed term, -1 for terms no indexed task uses."""
+        with self._lock:
+            return self._columns(self._term_features(terms))
+
+    def _columns(self, features):
+        if self._column_of is None:
+            return np.where(features < self._counts.shape[1], features, -1)
+        get = self._column_of.get
+        return np.array([get(f, -1) for f in features.tolist()], dtype=np.intp)
+
+    def _assign_columns(self, batch):
+        # A CSR batch's feature ids as columns; features new to this index
+        # take the next free columns.
+        features, at = np.unique(batch.indices, return_inverse=True)
+        column_of = self._column_of
+        cols = np.array([column_of.setdefault(f, len(column_of)) for f in features.tolist()], dtype=batch.indices.dtype)
+        return sp.csr_matrix((batch.data, cols[at], batch.indptr), shape=(batch.shape[0], len(column_of)), copy=False)
+
+    def _widen(self, n_terms):
+        # Columns for terms no indexed task uses yet: zero counts, zero df.
+        if n_terms > self._counts.shape[1]:
+            self._counts.resize((self._counts.shape[0], n_terms))
+            self._df = np.concatenate([self._df, np.zeros(n_terms - len(self._df))])
+            self._weighted = None
+
+    def _append(self, task_ids, batch):
+        batch = batch.tocsr()
+        if self._column_of is not None:
+            batch = self._assign_columns(batch)
+        self._widen(batch.shape[1])
+        batch.resize((batch.shape[0], self._counts.shape[1]))
+        self._row_of.update((tid, self._counts.shape[0] + i) for i, tid in enumerate(task_ids))
+        batch = batch.astype(self.dtype, copy=False)
+        self._counts = batch if not self._counts.shape[0] else sp.vstack([self._counts, batch], format="csr")
+        self._live = np.concatenate([self._live, np.ones(len(task_ids), dtype=bool)])
+        self._df += np.bincount(batch.indices, minlength=self._counts.shape[1])
+        self._weighted = None
+
+    def add(self, tasks):
+        """Index tasks from their text; returns the ids that were not indexed before."""
+        with self._lock:
+            new = list({t[0]: t for t in tasks if t[0] not in self._row_of}.values())
+            if new:
+                self._append([t[0] for t in new], self._count_rows([task_text(t) for t in new]))
+            return [t[0] for t in new]
+
+    def discard(self, task_ids):
+        """Drop tasks that left the open set (accepted); unknown ids are ignored."""
+        with self._lock:
+            rows = [self._row_of.pop(tid) for tid in task_ids if tid in self._row_of]
+            if not rows:
+                return
+            self._live[rows] = False
+            self._df -= np.bincount(self._counts[rows].indices, minlength=len(self._df))
+            self._weighted = None
+            if self._live.sum() * 2 < len(self._live):
+                self._compact()
+
+    def _compact(self):
+        keep = np.flatnonzero(self._live)
+        remap = np.full(len(self._live), -1)
+        remap[keep] = np.arange(len(keep))
+        self._counts = self._counts[keep]
+        self._live = np.ones(len(keep), dtype=bool)
+        self._row_of = {tid: int(remap[row]) for tid, row in self._row_of.items()}
+
+    def sync(self, conn, zip_code=None, category=None):
+        """Index open tasks stored since the last sync, by this or any other process.
+
+        ``zip_code`` / ``category`` limit the index to one shard of the open
+        set; pass the same scope on every sync. Returns the ids dropped
+        because they are no longer open.
+        """
+        with self._lock:
+            rows = _open_tasks(conn, "id, title, description, category", self._synced_id, zip_code, category)
+            self.add(rows)
+            if rows:
+                self._synced_id = rows[-1][0]
+            return self._drop_closed(conn, zip_code, category)
+
+    def _drop_closed(self, conn, zip_code, category):
+        # Tasks accepted (by any process) since the last check leave the index,
+        # so they stop counting toward IDF and their rows get compacted away.
+        # Skipped while the corpus version hasn't moved; the version is read
+        # first, so a change racing the scan is picked up next time.
+        version = corpus_version(conn)
+        if version == self._checked_version:
+            return []
+        still_open = {tid for (tid,) in _open_tasks(conn, "id", 0, zip_code, category)}
+        closed = [tid for tid in self._row_of if tid not in still_open]
+        self.discard(closed)
+        self._checked_version = version
+        return closed
+
+    def _weights(self):
+        if self._weighted is None:
+            if self.use_idf:
+                # sklearn's smooth_idf over the live documents
+                idf = np.log((1 + len(self._row_of)) / (1 + self._df)) + 1
+                rows = self._counts.multiply(idf.astype(self.dtype)).tocsr()
+            else:
+                idf, rows = None, self._counts
+            self._weighted = idf, normalize(rows)
+        return self._weighted
+
+    def idf(self):
+        return self._weights()[0]
+
+    def _expansion(self, text):
+        # Related terms of the query's taxonomy terms, as extra term counts in
+        # this index's columns, plus how the counts of taxonomy terms without a
+        # column change (before, after) -- those only add to the query norm.
+        found = self.synonyms.counts(Counter(_analyze_words(text)))
+        if not found.nnz:
+            return None
+        width = self._counts.shape[1]
+        if self._synonym_columns is None or self._synonym_columns[0] != width:
+            cols = self.term_columns(list(self.synonyms.terms))
+            known, unknown = np.flatnonzero(cols >= 0), np.flatnonzero(cols < 0)
+            to_columns = sp.csr_matrix((np.ones(len(known)), (known, cols[known])), shape=(len(cols), width))
+            with_related = sp.identity(len(cols), format="csr") + self.synonyms.matrix
+            self._synonym_columns = (
+                width,
+                (self.synonyms.matrix @ to_columns).tocsr(),
+                sp.identity(len(cols), format="csr")[:, unknown],
+                with_related[:, unknown].tocsr(),
+            )
+        _, to_columns, unseen, unseen_with_related = self._synonym_columns
+        return found @ to_columns, (found @ unseen).data, (found @ unseen_with_related).data
+
+    def query_vector(self, text):
+        """L2-normalized weighted row for a skills string, in this index's columns.
+
+        With ``synonyms`` set, terms related to the query's own are added at
+        ``synonyms.weight`` times the count of the term that brought them in.
+        """
+        with self._lock:
+            idf, _ = self._weights()
+            unseen_idf = math.log(1 + len(self._row_of)) + 1 if self.use_idf else 1.0
+            cols, counts, unseen = [], [], []
+            for col, tf in self._query_terms(text or ""):
+                if col is None:
+                    unseen.append(tf)
+                else:
+                    cols.append(col)
+                    counts.append(tf)
+            cols, counts = np.array(cols, dtype=np.intp), np.array(counts, dtype=np.float64)
+            unseen_sq = float(np.dot(unseen, unseen))
+            expansion = self._expansion(text or "") if self.synonyms is not None else None
+            if expansion is not None:
+                extra, before, after = expansion
+                cols, at = np.unique(np.concatenate([cols, extra.indices]), return_inverse=True)
+                counts = np.bincount(at, weights=np.concatenate([counts, extra.data]), minlength=len(cols))
+                unseen_sq += float(np.dot(after, after) - np.dot(before, before))
+            weights = counts * idf[cols] if self.use_idf else counts
+            # Terms no task uses still count toward the query norm, as they did
+            # when the query was fitted together with the tasks.
+            norm = math.sqrt(float(np.dot(weights, weights)) + unseen_idf ** 2 * unseen_sq) or 1.0
+            return sp.csr_matrix(
+                (weights / norm, cols, [0, len(cols)]), shape=(1, self._counts.shape[1]), dtype=self.dtype
+            )
+
+    def task_vectors(self, task_ids):
+        """L2-normalized weighted rows for indexed task ids, in the given order."""
+        with self._lock:
+            return self._weights()[1][[self._row_of[tid] for tid in task_ids]]
+
+    def score(self, tasks, query):
+        """Cosine similarity of each task row to the query, aligned with ``tasks``."""
+        with self._lock:
+            self.add(tasks)
+            q = self.query_vector(query)
+            X = self.task_vectors([t[0] for t in tasks])
+        return (X @ q.T).toarray().ravel()
+
+    def explain(self, tasks, query, n=3):
+        """Top-``n`` ``(term, contribution)`` pairs behind each task's score, aligned with ``tasks``.
+
+        Contributions are the element-wise product of the cached task row and
+        the query vector, summed per term name, so a task's contributions sum
+        to its cosine score. Term names come from the query (and its
+        synonyms), which also covers engines without a vocabulary.
+        """
+        with self._lock:
+            self.add(tasks)
+            q = self.query_vector(query)
+            X = self.task_vectors([t[0] for t in tasks])
+            name_of = self._term_names(query or "")
+        # Look each task entry up among the query's few columns (sorted).
+        order = np.argsort(q.indices)
+        q_cols, q_vals = q.indices[order], q.data[order]
+        at = np.minimum(np.searchsorted(q_cols, X.indices), max(len(q_cols) - 1, 0))
+        hit = q_cols[at] == X.indices if len(q_cols) else np.zeros(len(X.indices), dtype=bool)
+        products = np.where(hit, X.data * (q_vals[at] if len(q_vals) else 0.0), 0.0)
+        reasons = []
+        for i in range(len(tasks)):
+            lo, hi = X.indptr[i], X.indptr[i + 1]
+            matched = hit[lo:hi]
+            totals = {}
+            for col, value in zip(X.indices[lo:hi][matched].tolist(), products[lo:hi][matched].tolist()):
+                name = name_of.get(col, "?")
+                totals[name] = totals.get(name, 0.0) + value
+            best = sorted(totals.items(), key=lambda item: -item[1])[:n]
+            reasons.append([(name, value) for name, value in best if value > 0])
+        return reasons
+
+    def _term_names(self, query):
+        # column -> the query term (or synonym) it stands for
+        terms = Counter(_analyze_words(query))
+        if self.synonyms is not None:
+            terms = self.synonyms.expand(terms)
+        names = list(terms)[::-1]  # the query's own terms win hash collisions
+        return dict(zip(self.term_columns(names).tolist(), names))
+
+    def _postings(self):
+        # Inverted index over the weighted rows: CSC columns are per-term
+        # postings (row ids ascending), bounds[t] the largest weight in t's list.
+        weighted = self._weights()[1]
+        if self._inverted is None or self._inverted[0] is not weighted:
+            postings = weighted.tocsc()
+            postings.sort_indices()
+            bounds = postings.max(axis=0).toarray().ravel()
+            self._inverted = weighted, postings, bounds
+        return self._inverted[1:]
+
+    def search(self, tasks, query, k):
+        """Top-``k`` of ``tasks`` by MaxScore over the inverted index.
+
+        Returns ``(positions, scores)`` like ``top_k`` over ``score()``, but
+        only walks the postings of the query's terms. Terms are visited in
+        order of their best possible contribution; once the remaining terms
+        together cannot lift an unseen task past the current k-th score they
+        only update tasks already in the running, and tasks that can no
+        longer reach it are dropped.
+        """
+        if k <= 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0)
+        with self._lock:
+            self.add(tasks)
+            q = self.query_vector(query)
+            postings, bounds = self._postings()
+            row_of = self._row_of
+            rows = np.array([row_of[t[0]] for t in tasks], dtype=np.intp)
+        position = np.full(postings.shape[0], -1)
+        position[rows] = np.arange(len(tasks))
+        contribution = q.data * bounds[q.indices]
+        order = np.argsort(-contribution, kind="stable")
+        terms, weights = q.indices[order], q.data[order]
+        remaining = np.concatenate([np.cumsum(contribution[order][::-1])[::-1], [0.0]])
+
+        cand, acc, theta = np.zeros(0, dtype=np.intp), np.zeros(0), 0.0
+        for i, (term, weight) in enumerate(zip(terms, weights)):
+            lo, hi = postings.indptr[term], postings.indptr[term + 1]
+            hits = postings.indices[lo:hi]
+            keep = position[hits] >= 0
+            hits, gains = hits[keep], weight * postings.data[lo:hi][keep]
+            if remaining[i] < theta:
+                _, at, from_hits = np.intersect1d(cand, hits, assume_unique=True, return_indices=True)
+                acc[at] += gains[from_hits]
+            else:
+                cand, inverse = np.unique(np.concatenate([cand, hits]), return_inverse=True)
+                acc = np.bincount(inverse, weights=np.concatenate([acc, gains]), minlength=len(cand))
+            if len(acc) >= k:
+                theta = np.partition(acc, len(acc) - k)[len(acc) - k]
+                alive = acc + remaining[i + 1] >= theta
+                cand, acc = cand[alive], acc[alive]
+
+        pos = position[cand]
+        by_position = np.argsort(pos)
+        pos, acc = pos[by_position], acc[by_position]
+        best = top_k(acc, k)
+        positions, scores = pos[best], acc[best]
+        if len(positions) < k:
+            # Fewer than k tasks share a term with the query: pad with
+            # zero-score tasks in input order, as a full ranking would.
+            rest = np.setdiff1d(np.arange(len(tasks)), positions, assume_unique=True)[:k - len(positions)]
+            positions = np.concatenate([positions, rest])
+            scores = np.concatenate([scores, np.zeros(len(rest))])
+        return positions, scores
+
+    def score_matrix(self, tasks, queries):
+        """Sparse cosine scores with one row per query and one column per task."""
+        with self._lock:
+            self.add(tasks)
+            Q = sp.vstack([self.query_vector(q) for q in queries], format="csr")
+            X = self.task_vectors([t[0] for t in tasks])
+        return (Q @ X.T).tocsr()
+
+
+class TfidfIndex(SparseIndex):
+    """Long-lived TF-IDF vectors for the open tasks.
+
+    Same analyzer and smooth-IDF weighting as
+    ``TfidfVectorizer(stop_words="english", ngram_range=(1, 2))``, but the
+    vocabulary and document frequencies grow and shrink as tasks are added
+    and discarded, so nothing is ever refit. A query only analyzes the
+    skills string.
+
+    This is an intentional approximation of the old per-call fit. That fit
+    included the query as a document, so the query's terms counted toward
+    df and N. Here df and N cover the tasks alone. Scores therefore differ
+    slightly: by up to ~0.013 over 3k synthetic tasks, enough to reorder
+    near-ties.
+
+    Once ``sync`` has been called the vocabulary is the database's ``terms``
+    table, and tasks are loaded from their stored vectors instead of text.
+    Indexes synced from the same database may share one ``vocabulary`` dict.
+    """
+
+    def __init__(self, vocabulary=None):
+        super().__init__()
+        self.vocabulary = {} if vocabulary is None else vocabulary
+        # True once term ids come from the terms table; a shared vocabulary always does
+        self._db_vocabulary = False
+        if vocabulary is not None:
+            self._use_db_vocabulary()
+        self._provisional = set()             # indexed from text only; replaced by the stored vector
+
+    def _count_rows(self, texts):
+        indptr, indices, data = [0], [], []
+        for text in texts:
+            counts = Counter(_analyze_words(text))
+            # Ids of a database-backed vocabulary are only ever assigned by vectorize().
+            if not self._db_vocabulary:
+                for term in counts:
+                    self.vocabulary.setdefault(term, len(self.vocabulary))
+            known = [term for term in counts if term in self.vocabulary]
+            indices.extend(self.vocabulary[term] for term in known)
+            data.extend(counts[term] for term in known)
+            indptr.append(len(indices))
+        return sp.csr_matrix((data, indices, indptr), shape=(len(texts), len(self.vocabulary)))
+
+    def _query_terms(self, text):
+        counts = Counter(_analyze_words(text))
+        cols = self.term_columns(counts)
+        return [(None if col < 0 else col, tf) for col, tf in zip(cols.tolist(), counts.values())]
+
+    def _term_features(self, terms):
+        return np.array([self.vocabulary.get(term, -1) for term in terms], dtype=np.intp)
+
+    def _use_db_vocabulary(self):
+        # Term ids number every term in the database, so they go through the
+        # column map (the index holds no rows at this point).
+        if not self._db_vocabulary:
+            self._db_vocabulary = True
+            self._column_of = {}
+
+    def add(self, tasks):
+        with self._lock:
+            new = super().add(tasks)
+            if self._db_vocabulary:
+                # Only terms already pulled from the terms table were counted.
+                self._provisional.update(new)
+            return new
+
+    def add_vectors(self, rows):
+        """Index ``(task_id, vector_blob)`` pairs read from the database."""
+        with self._lock:
+            rows = [(tid, blob) for tid, blob in rows if blob is not None]
+            self.discard([tid for tid, _ in rows if tid in self._provisional])
+            rows = [(tid, blob) for tid, blob in rows if tid not in self._row_of]
+            if not rows:
+                return
+            decoded = [decode_vector(blob) for _, blob in rows]
+            indices = np.concatenate([ix for ix, _ in decoded])
+            indptr = np.concatenate([[0], np.cumsum([len(ix) for ix, _ in decoded])])
+            width = max(len(self.vocabulary), int(np.max(indices, initial=-1)) + 1)
+            batch = sp.csr_matrix(
+                (np.concatenate([vals for _, vals in decoded]), indices, indptr), shape=(len(rows), width)
+            )
+            self._append([tid for tid, _ in rows], batch)
+
+    def discard(self, task_ids):
+        with self._lock:
+            self._provisional.difference_update(task_ids)
+            super().discard(task_ids)
+
+    def load_snapshot(self, conn, snapshot, zip_code=None, category=None):
+        """Start a fresh index from ``snapshot``'s rows for this scope; returns whether it did.
+
+        The rows stay memory-mapped until the index first changes. Tasks the
+        snapshot has that are no longer open are dropped, and the next
+        ``sync`` pulls whatever was stored after it.
+        """
+        with self._lock:
+            found = snapshot.rows(zip_code, category)
+            if found is None or self._synced_id or self._row_of:
+                return False
+            if not self._db_vocabulary and self.vocabulary:
+                raise RuntimeError("index already has an in-memory vocabulary; load into a fresh TfidfIndex")
+            self._use_db_vocabulary()
+            if len(self.vocabulary) < snapshot.n_terms:
+                self.vocabulary.update(zip(snapshot.terms(), range(snapshot.n_terms)))
+            task_ids, counts = found
+            # Data and indptr stay views; the indices are rewritten as columns.
+            self._column_of.clear()
+            self._synonym_columns = None
+            counts = self._counts = self._assign_columns(counts)
+            # Ids in ascending order, as a sync would have added them.
+            order = np.argsort(task_ids, kind="stable")
+            self._row_of = dict(zip(task_ids[order].tolist(), order.tolist()))
+            self._live = np.ones(len(task_ids), dtype=bool)
+            self._df = np.bincount(counts.indices, minlength=counts.shape[1]).astype(np.float64)
+            self._weighted = None
+            self._synced_id = snapshot.synced_id
+            self._drop_closed(conn, zip_code, category)
+            return True
+
+    def sync(self, conn, zip_code=None, category=None):
+        """Pull terms and open-task vectors stored since the last sync.
+
+        Both reads are range scans, so a sync with nothing new is cheap. Tasks
+        closed since the last sync are dropped and returned, as in
+        ``SparseIndex.sync``.
+        """
+        with self._lock:
+            if not self._db_vocabulary and self.vocabulary:
+                raise RuntimeError("index already has an in-memory vocabulary; sync a fresh TfidfIndex")
+            self._use_db_vocabulary()
+            for term_id, term in conn.execute(
+                "SELECT id, term FROM terms WHERE id >= ? ORDER BY id", (len(self.vocabulary),)
+            ):
+                self.vocabulary[term] = term_id
+            rows = _open_tasks(conn, "id, vector", self._synced_id, zip_code, category)
+            self.add_vectors(rows)
+            if rows:
+                self._synced_id = rows[-1][0]
+            return self._drop_closed(conn, zip_code, category)
+
+
+def _transform(vectorizer, texts):
+    return vectorizer.transform(texts)
+
+
+class HashingIndex(SparseIndex):
+    """Feature-hashed term counts: fixed width, no vocabulary, nothing to fit.
+
+    Any process hashes the same text to the same columns, so tasks are
+    vectorized independently of each other; large batches are split across
+    ``n_jobs`` worker processes. With ``use_idf`` the weights come from the
+    running document-frequency table of the indexed tasks, otherwise
+    tasks are scored on plain term frequency.
+    """
+
+    def __init__(self, n_features=2 ** 18, use_idf=True, n_jobs=1, batch_size=20000):
+        super().__init__()
+        self._column_of = {}                  # buckets used by indexed tasks only
+        self.use_idf = use_idf
+        self.n_jobs = n_jobs
+        self.batch_size = batch_size
+        self._vectorizer = HashingVectorizer(
+            **WORD_ANALYZER, n_features=n_features, alternate_sign=False, norm=None
+        )
+
+    def _count_rows(self, texts):
+        if self.n_jobs == 1 or len(texts) <= self.batch_size:
+            return self._vectorizer.transform(texts)
+        chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        parts = Parallel(n_jobs=self.n_jobs)(delayed(_transform)(self._vectorizer, c) for c in chunks)
+        return sp.vstack(parts, format="csr")
+
+    def _query_terms(self, text):
+        row = self._vectorizer.transform([text])
+        cols = self._columns(row.indices)
+        return [(None if col < 0 else col, tf) for col, tf in zip(cols.tolist(), row.data)]
+
+    def _term_features(self, terms):
+        # HashingVectorizer hashes analyzed terms with this same FeatureHasher.
+        if not terms:
+            return np.zeros(0, dtype=np.intp)
+        hasher = FeatureHasher(self._vectorizer.n_features, input_type="string", alternate_sign=False)
+        return hasher.transform([[term] for term in terms]).indices.astype(np.intp)
+
+
+class CharNgramIndex(SparseIndex):
+    """TF-IDF over character n-grams: typo-tolerant matching.
+
+    Each word is padded with spaces and cut into 3-5 character grams
+    (``char_wb``), so "plumbng" still shares most of its grams with
+    "plumbing" where the word engines see two unrelated terms. The gram
+    vocabulary grows as tasks are added and is never refit; counts and
+    weighted rows are float32, since a task has several times more grams
+    than words. Synonym expansion works on word terms and does not apply.
+    """
+
+    dtype = np.float32
+
+    def __init__(self):
+        super().__init__()
+        self.vocabulary = {}
+
+    def _count_rows(self, texts):
+        # Typed buffers: a batch has hundreds of grams per task.
+        indptr, indices, data = array("i", [0]), array("i"), array("f")
+        for text in texts:
+            counts = Counter(_analyze_chars(text))
+            for gram in counts:
+                self.vocabulary.setdefault(gram, len(self.vocabulary))
+            indices.extend(self.vocabulary[gram] for gram in counts)
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        return sp.csr_matrix(
+            (np.frombuffer(data, dtype=np.float32), np.frombuffer(indices, dtype=np.int32),
+             np.frombuffer(indptr, dtype=np.int32)),
+            shape=(len(texts), len(self.vocabulary)),
+        )
+
+    def _query_terms(self, text):
+        counts = Counter(_analyze_chars(text))
+        cols = self.term_columns(counts)
+        return [(None if col < 0 else col, tf) for col, tf in zip(cols.tolist(), counts.values())]
+
+    def _term_features(self, terms):
+        return np.array([self.vocabulary.get(term, -1) for term in terms], dtype=np.intp)
+
+    def _expansion(self, text):
+        return None
+
+    def _term_names(self, query):
+        # Every gram of a query word is named after that word, so contributions
+        # add up per word ("plumbng" rather than " plu", "plum", ...).
+        names = {}
+        for word in query.lower().split():
+            cols = self.term_columns(_analyze_chars(word))
+            for col in cols[cols >= 0].tolist():
+                names.setdefault(col, word.strip(string.punctuation) or word)
+        return names
+
+
+class DenseIndex:
+    """Latent-semantic engine: TF-IDF rows projected by TruncatedSVD.
+
+    Tasks live as L2-normalized float32 rows of one contiguous matrix, so a
+    query is a projection of the skills string plus one dense mat-vec.
+    Terms that co-occur across tasks ("lawn mowing", "yardwork") land close
+    together even when the words differ. Tasks added after a fit are
+    projected with the current model; once ``refresh_ratio`` of the corpus
+    has changed, the SVD is refit on a background thread and swapped in.
+    Until the corpus has more tasks and terms than ``n_components``, scores
+    come from the TF-IDF base.
+    """
+
+    def __init__(self, n_components=100, refresh_ratio=0.2, base=None):
+        self.base = base if base is not None else TfidfIndex()
+        self.n_components = n_components
+        self.refresh_ratio = refresh_ratio
+        self._lock = threading.RLock()
+        self._svd = None
+        self._width = 0                       # base columns the model was fitted on
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._n = 0                           # rows of _vectors in use
+        self._row_of = {}
+        self._changes = 0                     # adds + discards since the last fit
+        self._refreshing = False
+
+    def __len__(self):
+        return len(self.base)
+
+    def __contains__(self, task_id):
+        return task_id in self.base
+
+    def add(self, tasks):
+        new = self.base.add(tasks)
+        self._note_changes(len(new))
+        return new
+
+    def discard(self, task_ids):
+        before = len(self.base)
+        self.base.discard(task_ids)
+        with self._lock:
+            for tid in task_ids:
+                self._row_of.pop(tid, None)
+        self._note_changes(before - len(self.base))
+
+    def sync(self, conn, zip_code=None, category=None):
+        before = len(self.base)
+        closed = self.base.sync(conn, zip_code, category)
+        with self._lock:
+            for tid in closed:
+                self._row_of.pop(tid, None)
+        self._note_changes(len(self.base) - before + 2 * len(closed))
+        return closed
+
+    def _note_changes(self, n):
+        with self._lock:
+            self._changes += n
+            due = self._svd is not None and self._changes > self.refresh_ratio * max(len(self.base), 1)
+        if due:
+            self.refresh()
+
+    def refresh(self, wait=False):
+        """Refit the SVD on the current corpus; in the background unless ``wait``."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        if wait:
+            self._refit()
+        else:
+            threading.Thread(target=self._refit, name="lsa-refresh", daemon=True).start()
+
+    def _refit(self):
+        try:
+            # One lock for both reads: a discard in between would leave an id without a row.
+            with self.base._lock:
+                ids = self.base.task_ids()
+                rows = self.base.task_vectors(ids)
+            if min(rows.shape) <= self.n_components:
+                return  # too few tasks/terms for a reduced space to mean anything
+            svd = TruncatedSVD(n_components=self.n_components, random_state=0).fit(rows)
+            vectors = np.ascontiguousarray(normalize(svd.transform(rows)), dtype=np.float32)
+            with self._lock:
+                self._svd, self._width = svd, rows.shape[1]
+                self._vectors, self._n = vectors, len(ids)
+                self._row_of = {tid: i for i, tid in enumerate(ids)}
+                self._changes = 0
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _embed(self, rows):
+        # base may have grown columns since the fit; the model ignores them
+        return normalize(self._svd.transform(rows[:, :self._width])).astype(np.float32)
+
+    def _project(self, task_ids):
+        if not task_ids:
+            return
+        vectors = self._embed(self.base.task_vectors(task_ids))
+        if self._n + len(task_ids) > len(self._vectors):
+            grown = np.zeros((max(2 * len(self._vectors), self._n + len(task_ids)), vectors.shape[1]), np.float32)
+            grown[:self._n] = self._vectors[:self._n]
+            self._vectors = grown
+        self._vectors[self._n:self._n + len(task_ids)] = vectors
+        self._row_of.update((tid, self._n + i) for i, tid in enumerate(task_ids))
+        self._n += len(task_ids)
+
+    def _rows(self, tasks):
+        self.add(tasks)
+        if self._svd is None:
+            self.refresh(wait=True)
+        with self._lock:
+            if self._svd is None:
+                return None
+            self._project([t[0] for t in tasks if t[0] not in self._row_of])
+            return self._vectors[[self._row_of[t[0]] for t in tasks]]
+
+    def score(self, tasks, query):
+        """Cosine similarity in the latent space, aligned with ``tasks``."""
+        with self._lock:
+            X = self._rows(tasks)
+            if X is None:
+                return self.base.score(tasks, query)
+            q = self._embed(self.base.query_vector(query))[0]
+        return X @ q
+
+    def score_matrix(self, tasks, queries):
+        with self._lock:
+            X = self._rows(tasks)
+            if X is None:
+                return self.base.score_matrix(tasks, queries)
+            Q = self._embed(sp.vstack([self.base.query_vector(q) for q in queries], format="csr"))
+        return sp.csr_matrix(Q @ X.T)
+
+
+# -------------------------
+# AI Task Matching
+# -------------------------
+ENGINES = {
+    "tfidf": TfidfIndex,
+    "hashing": HashingIndex,
+    "lsa": DenseIndex,
+    "chargram": CharNgramIndex,
+}
+
+
+def engine_class(engine):
+    """The index class registered as ``engine``; ValueError for unknown names."""
+    try:
+        return ENGINES[engine]
+    except KeyError:
+        raise ValueError(f"unknown match engine {engine!r}; choose from {', '.join(ENGINES)}") from None
+
+
+def make_index(engine="tfidf", **options):
+    return engine_class(engine)(**options)
+
+
+def engine_analyzer(engine):
+    """The function that turns text into the terms ``engine`` indexes."""
+    return _analyze_chars if engine == "chargram" else _analyze_words
+
+
+def top_k(scores, k=None):
+    """Positions of the ``k`` best scores, best first; ties keep input order.
+
+    np.partition finds the k-th best score in linear time, so only the k
+    selected rows get sorted; ties at that score go to the earliest rows,
+    exactly as a full stable sort would pick them.
+    """
+    scores = np.asarray(scores)
+    if k is None or k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    kth = -np.partition(-scores, k - 1)[k - 1]
+    above = np.flatnonzero(scores > kth)
+    top = np.concatenate([above, np.flatnonzero(scores == kth)[:k - len(above)]])
+    return top[np.lexsort((top, -scores[top]))]
+
+
+def rank_tasks_by_match(tasks: List[tuple], helper_keywords: str, index=None, engine="tfidf", k=None):
+    """Pair each task with its match score against the skills, best first.
+
+    Pass the process-wide ``index`` to reuse its vectors; without one the
+    tasks are indexed from scratch for this call by a fresh ``engine`` index.
+    With ``k`` only the k best are returned.
+    """
+    if not tasks:
+        return []
+    if index is None:
+        index = make_index(engine)
+    if k is not None and len(tasks) >= getattr(index, "prune_min_tasks", math.inf):
+        order, scores = index.search(tasks, helper_keywords or "", k)
+        return list(zip([tasks[i] for i in order], scores.tolist()))
+    scores = index.score(tasks, helper_keywords or "")
+    order = top_k(scores, k)
+    return list(zip([tasks[i] for i in order], scores[order].tolist()))
+
+
+# -------------------------
+# Sharded indexes
+# -------------------------
+class ShardedIndex:
+    """One ``engine`` index per ZIP (or ZIP and category), built on first use.
+
+    The Find Tasks view only ever ranks the open tasks of one ZIP, so a
+    helper's query loads and scores just that shard, and IDF reflects the
+    tasks actually competing for the helper. At most ``max_shards`` shards
+    are kept; the least recently used one is dropped and rebuilt from the
+    database if it is needed again. TF-IDF shards share one terms vocabulary;
+    every shard gets ``synonyms`` (a SynonymMap) for query expansion. With a
+    ``pool`` (a ScoringPool), large top-k searches run in its workers. With a
+    ``snapshot`` (a TaskSnapshot), new TF-IDF and LSA shards start from its
+    rows instead of reading every stored vector.
+    """
+
+    def __init__(self, engine="tfidf", max_shards=256, synonyms=None, pool=None, snapshot=None, **options):
+        engine_class(engine)  # checked here: shards are built lazily
+        self.engine = engine
+        self.max_shards = max_shards
+        self.synonyms = synonyms
+        self.pool = pool
+        self.snapshot = snapshot if engine in ("tfidf", "lsa") else None  # only these use term-id columns
+        self.options = options
+        self._lock = threading.Lock()
+        self._shards = OrderedDict()          # (zip, category or None) -> index, oldest first
+        self._vocabulary = {}
+        if self.snapshot is not None:
+            self._vocabulary.update(zip(self.snapshot.terms(), range(self.snapshot.n_terms)))
+
+    def __len__(self):
+        return len(self._shards)
+
+    def __contains__(self, key):
+        return key in self._shards
+
+    def _make_shard(self):
+        if self.engine == "tfidf":
+            index = TfidfIndex(vocabulary=self._vocabulary)
+        elif self.engine == "lsa":
+            index = DenseIndex(base=TfidfIndex(vocabulary=self._vocabulary), **self.options)
+        else:
+            index = make_index(self.engine, **self.options)
+        getattr(index, "base", index).synonyms = self.synonyms
+        return index if self.pool is None else PooledIndex(index, self.pool)
+
+    def shard(self, conn, zip_code, category=None):
+        """The index for ``zip_code`` (and ``category``), synced with ``conn``."""
+        key = (zip_code, category)
+        with self._lock:
+            index = self._shards.get(key)
+            created = index is None
+            if created:
+                index = self._shards[key] = self._make_shard()
+            self._shards.move_to_end(key)
+            while len(self._shards) > self.max_shards:
+                self._shards.popitem(last=False)
+        if created and self.snapshot is not None:
+            getattr(index, "base", index).load_snapshot(conn, self.snapshot, zip_code, category)
+        index.sync(conn, zip_code, category)
+        return index
+
+    def discard(self, task_ids):
+        with self._lock:
+            shards = list(self._shards.values())
+        for index in shards:
+            index.discard(task_ids)
+
+    def score(self, conn, tasks, query, category=None):
+        """Text scores of full tasks rows, each scored in its ZIP's shard, aligned with ``tasks``."""
+        scores = np.zeros(len(tasks))
+        by_zip = {}
+        for i, task in enumerate(tasks):
+            by_zip.setdefault(task[5], []).append(i)
+        for zip_code, positions in by_zip.items():
+            shard = self.shard(conn, zip_code, category)
+            scores[positions] = shard.score([tasks[i] for i in positions], query)
+        return scores
+
+    def explain(self, conn, tasks, query, category=None, n=3):
+        """``explain`` of full tasks rows, each in its ZIP's shard (LSA via its TF-IDF base)."""
+        reasons = [None] * len(tasks)
+        by_zip = {}
+        for i, task in enumerate(tasks):
+            by_zip.setdefault(task[5], []).append(i)
+        for zip_code, positions in by_zip.items():
+            shard = self.shard(conn, zip_code, category)
+            found = getattr(shard, "base", shard).explain([tasks[i] for i in positions], query, n)
+            for i, terms in zip(positions, found):
+                reasons[i] = terms
+        return reasons
+
+    def rank(self, conn, tasks, helper_keywords, k=None, category=None):
+        """``rank_tasks_by_match`` for tasks from any number of ZIPs.
+
+        ``tasks`` are full tasks rows (zip in column 5). Each ZIP's tasks are
+        ranked in their own shard and the per-ZIP lists are merged by score;
+        ties keep the input order.
+        """
+        by_zip = {}
+        for task in tasks:
+            by_zip.setdefault(task[5], []).append(task)
+        ranked = []
+        for zip_code, group in by_zip.items():
+            ranked += rank_tasks_by_match(group, helper_keywords, self.shard(conn, zip_code, category), k=k)
+        position = {task[0]: i for i, task in enumerate(tasks)}
+        ranked.sort(key=lambda pair: (-pair[1], position[pair[0][0]]))
+        return ranked[:k]
+
+
+# -------------------------
+# Process-pool scoring
+# -------------------------
+_worker_snapshots = OrderedDict()           # in a worker process: snapshot dir -> memory-mapped postings
+
+
+def _load_snapshot(path):
+    postings = _worker_snapshots.get(path)
+    if postings is None:
+        parts = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ("data", "indices", "indptr")]
+        shape = tuple(np.load(os.path.join(path, "shape.npy")))
+        postings = _worker_snapshots[path] = sp.csc_matrix(tuple(parts), shape=shape, copy=False)
+        while len(_worker_snapshots) > 4:
+            _worker_snapshots.popitem(last=False)
+    return postings
+
+
+def _score_rows(path, rows, q_indices, q_data, k):
+    # Worker side: top-k of the given task rows against the query, walking
+    # only the query terms' postings (a row appears once per term).
+    postings = _load_snapshot(path)
+    position = np.full(postings.shape[0], -1)
+    position[rows] = np.arange(len(rows))
+    scores = np.zeros(len(rows))
+    for term, weight in zip(q_indices, q_data):
+        lo, hi = postings.indptr[term], postings.indptr[term + 1]
+        at = position[postings.indices[lo:hi]]
+        keep = at >= 0
+        scores[at[keep]] += weight * postings.data[lo:hi][keep]
+    best = top_k(scores, k)
+    return best, scores[best]
+
+
+class ScoringPool:
+    """Scores large candidate sets in worker processes instead of the calling thread.
+
+    An index's term postings (the CSC form of its weighted task matrix) are
+    written once per change as .npy files that every worker memory-maps, so
+    a query only ships candidate row numbers and the query vector. Candidates are split into one contiguous
+    chunk per worker; each returns its local top-k and the chunks are merged.
+    Sessions ranking at the same time then run on separate cores instead of
+    queueing on the GIL. If a worker dies, the search that notices is scored
+    in-process and the next one gets a fresh set of workers.
+    """
+
+    def __init__(self, workers=2, min_tasks=20000):
+        self.workers = workers
+        self.min_tasks = min_tasks
+        self._executor = self._start()
+        self._dir = tempfile.mkdtemp(prefix="neardoer-scoring-")
+        self._lock = threading.Lock()
+        self._snapshots = {}                  # id(index) -> (weakref to weighted matrix, snapshot dir)
+        self._in_use = Counter()              # snapshot dir -> searches still reading it
+        self._stale = set()                   # replaced dirs, removed once nothing reads them
+        self._written = 0
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self._dir, ignore_errors=True)  # also at exit
+
+    def _start(self):
+        # Forked, not spawned or served by a fork server: those children
+        # re-import __main__, and under Streamlit that is the app script. The
+        # fork happens here, in a server process whose other threads (Tornado,
+        # script runners) are already running, so children inherit any lock
+        # those threads hold at that moment. All workers are forked at once by
+        # the first submit and run only _score_rows (numpy over snapshot
+        # files), which takes none of those locks; CPython 3.12+ still warns.
+        executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("fork"))
+        executor.submit(int).result()
+        return executor
+
+    def _restart(self, broken):
+        with self._lock:
+            if self._executor is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._start()
+
+    def _release(self, path):
+        # Caller holds _lock.
+        if self._in_use[path] <= 0 and path in self._stale:
+            self._stale.discard(path)
+            del self._in_use[path]
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _forget(self, key):
+        with self._lock:
+            entry = self._snapshots.pop(key, None)
+            if entry is not None:
+                self._stale.add(entry[1])
+                self._release(entry[1])
+
+    def _checkout(self, index, weighted, postings):
+        """Snapshot dir holding ``postings`` of ``weighted``, written if needed; pair with ``_checkin``."""
+        with self._lock:
+            current = self._snapshots.get(id(index))
+            if current is None or current[0]() is not weighted:
+                self._written += 1
+                path = os.path.join(self._dir, f"snapshot-{self._written}")
+                os.makedirs(path)
+                for name, values in (("data", postings.data), ("indices", postings.indices),
+                                    ("indptr", postings.indptr), ("shape", np.array(postings.shape))):
+                    np.save(os.path.join(path, f"{name}.npy"), values)
+                if current is None:
+                    weakref.finalize(index, self._forget, id(index))
+                else:
+                    self._stale.add(current[1])
+                    self._release(current[1])
+                current = self._snapshots[id(index)] = weakref.ref(weighted), path
+            self._in_use[current[1]] += 1
+            return current[1]
+
+    def _checkin(self, path):
+        with self._lock:
+            self._in_use[path] -= 1
+            self._release(path)
+
+    def search(self, index, tasks, query, k):
+        """``(positions, scores)`` of the top-``k`` of ``tasks``, like ``SparseIndex.search``."""
+        if k <= 0:
+            return index.search(tasks, query, k)
+        with index._lock:
+            index.add(tasks)
+            q = index.query_vector(query)
+            weighted = index._weights()[1]
+            postings = index._postings()[0]
+            rows = np.array([index._row_of[t[0]] for t in tasks], dtype=np.intp)
+            path = self._checkout(index, weighted, postings)
+        executor = self._executor
+        try:
+            bounds = np.linspace(0, len(rows), self.workers + 1).astype(int)
+            futures = [
+                (lo, executor.submit(_score_rows, path, rows[lo:hi], q.indices, q.data, k))
+                for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo
+            ]
+            positions, scores = [], []
+            for lo, future in futures:
+                best, best_scores = future.result()
+                positions.append(best + lo)
+                scores.append(best_scores)
+        except BrokenProcessPool:
+            # A worker was killed (OOM, signal): answer in-process this time.
+            self._restart(executor)
+            return index.search(tasks, query, k)
+        finally:
+            self._checkin(path)
+        positions, scores = np.concatenate(positions), np.concatenate(scores)
+        # Chunks are in input order, so ties still go to the earliest task.
+        best = top_k(scores, k)
+        return positions[best], scores[best]
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+        self._cleanup()
+
+
+class PooledIndex:
+    """An index whose top-k searches over ``pool.min_tasks`` or more candidates run in ``pool``.
+
+    Smaller searches, and everything else (add, sync, score, explain, ...),
+    go straight to ``index``. Only the sparse engines are offloaded; LSA
+    searches stay in-process.
+    """
+
+    def __init__(self, index, pool):
+        self.index = index
+        self.pool = pool
+        self.prune_min_tasks = min(getattr(index, "prune_min_tasks", math.inf), pool.min_tasks)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, task_id):
+        return task_id in self.index
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+    def search(self, tasks, query, k):
+        if isinstance(self.index, SparseIndex) and len(tasks) >= self.pool.min_tasks:
+            return self.pool.search(self.index, tasks, query, k)
+        if len(tasks) >= getattr(self.index, "prune_min_tasks", math.inf):
+            return self.index.search(tasks, query, k)
+        scores = self.index.score(tasks, query)
+        best = top_k(scores, k)
+        return best, scores[best]
+
+
+# -------------------------
+# Hybrid ranking
+# -------------------------
+HYBRID_COMPONENTS = ("text", "distance", "price", "recency")
+_PRICE_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+def parse_price(price):
+    """First amount in a free-text price ("$40", "25/hr", "$1,200-1,500"); NaN if none."""
+    found = _PRICE_NUMBER.search(price or "")
+    return float(found.group().replace(",", "")) if found else math.nan
+
+
+def parse_timestamp(created_at):
+    """Epoch seconds of a stored created_at (naive ISO strings are UTC); NaN if unparseable."""
+    try:
+        stamp = datetime.fromisoformat(created_at)
+    except (TypeError, ValueError):
+        return math.nan
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return stamp.timestamp()
+
+
+def hybrid_scores(text, features, origin=None, now=None, weights=None, distance_scale=5.0, half_life_days=7.0):
+    """Weighted blend of the components for ``features`` rows (lat, lon, price, created).
+
+    Each component is in [0, 1] -- text similarity, ``exp(-miles / distance_scale)``
+    from ``origin`` (lat, lon radians), price relative to the best-paid
+    candidate, and ``0.5 ** (age / half_life_days)`` -- and unknown values
+    score 0. The result is divided by the total weight, so it stays in [0, 1].
+    """
+    weights = weights or {"text": 1.0}
+    total = sum(weights.values()) or 1.0
+    score = weights.get("text", 0.0) * np.asarray(text, dtype=float)
+    if weights.get("distance") and origin is not None:
+        miles = haversine_miles(origin, features[:, :2])
+        score += weights["distance"] * np.nan_to_num(np.exp(-miles / distance_scale))
+    if weights.get("price"):
+        price = features[:, 2]
+        best = np.nanmax(price, initial=0.0)
+        if best > 0:
+            score += weights["price"] * np.nan_to_num(price / best)
+    if weights.get("recency"):
+        age_days = ((time.time() if now is None else now) - features[:, 3]) / 86400
+        score += weights["recency"] * np.nan_to_num(0.5 ** (np.maximum(age_days, 0) / half_life_days))
+    return score / total
+
+
+class HybridRanker:
+    """Ranks candidates on ``hybrid_scores`` of text match, distance, price and recency.
+
+    Each task's location, price and post time are parsed once, the first
+    time it is ranked, into rows of one float array; ranking a candidate set
+    is then a row gather plus a few NumPy expressions. Rows are keyed on the
+    fields they are parsed from, so a task whose price changed is parsed
+    again. Past ``max_tasks`` rows the cache starts over from the tasks
+    being ranked. ``zip_index`` is a ``geo.ZipIndex``.
+    """
+
+    def __init__(self, zip_index, weights=None, distance_scale=5.0, half_life_days=7.0, max_tasks=100000):
+        unknown = set(weights or ()) - set(HYBRID_COMPONENTS)
+        if unknown:
+            raise ValueError(f"unknown hybrid weights {sorted(unknown)}; choose from {', '.join(HYBRID_COMPONENTS)}")
+        self.zip_index = zip_index
+        self.weights = dict(weights or {"text": 1.0})
+        self.distance_scale = distance_scale
+        self.half_life_days = half_life_days
+        self.max_tasks = max_tasks
+        self._lock = threading.Lock()
+        self._features = np.zeros((0, 4))     # lat, lon (radians), price, created (epoch s)
+        self._n = 0
+        self._row_of = {}                     # (id, zip, price, created_at) -> row in _features
+
+    def features(self, tasks):
+        """``(len(tasks), 4)`` feature rows for full tasks rows, parsing unseen tasks."""
+        with self._lock:
+            keys = [(t[0], t[5], t[4], t[9]) for t in tasks]
+            new = {key: t for key, t in zip(keys, tasks) if key not in self._row_of}
+            if new and self._n + len(new) > self.max_tasks:
+                # Drops the rows of closed tasks and of superseded prices.
+                self._n, self._row_of = 0, {}
+                new = dict(zip(keys, tasks))
+            new = list(new.values())
+            if new:
+                rows = np.column_stack([
+                    self.zip_index.radians([t[5] for t in new]),
+                    [parse_price(t[4]) for t in new],
+                    [parse_timestamp(t[9]) for t in new],
+                ])
+                if self._n + len(new) > len(self._features):
+                    grown = np.zeros((max(2 * len(self._features), self._n + len(new)), 4))
+                    grown[:self._n] = self._features[:self._n]
+                    self._features = grown
+                self._features[self._n:self._n + len(new)] = rows
+                self._row_of.update(((t[0], t[5], t[4], t[9]), self._n + i) for i, t in enumerate(new))
+                self._n += len(new)
+            return self._features[[self._row_of[key] for key in keys]]
+
+    def scores(self, tasks, text_scores, origin_zip=None, now=None):
+        origin = self.zip_index.radians([origin_zip])[0] if origin_zip else None
+        if origin is not None and np.isnan(origin).any():
+            origin = None
+        return hybrid_scores(
+            text_scores, self.features(tasks), origin, now, self.weights, self.distance_scale, self.half_life_days
+        )
+
+    def rank(self, tasks, text_scores, origin_zip=None, k=None, now=None):
+        """``(task, hybrid score)`` pairs, best first, like ``rank_tasks_by_match``."""
+        if not tasks:
+            return []
+        scores = self.scores(tasks, text_scores, origin_zip, now)
+        order = top_k(scores, k)
+        return list(zip([tasks[i] for i in order], scores[order].tolist()))
+
+
+# -------------------------
+# Ranking cache
+# -------------------------
+def normalize_skills(skills):
+    # Case and spacing never change how skills are analyzed.
+    return " ".join((skills or "").lower().split())
+
+
+class RankingCache:
+    """Bounded LRU of ranked results for one corpus version.
+
+    Entries are looked up with the current ``db.corpus_version``; the first
+    lookup with a newer version drops everything cached for older ones, so a
+    result is never served after the open tasks changed. ``ttl`` (seconds)
+    additionally expires entries whose scores age with the clock (recency).
+    """
+
+    def __init__(self, max_entries=1024, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()         # key -> (stored at, result), oldest first
+        self._version = None
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_version(self, version):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, version, result):
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = time.monotonic(), result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# -------------------------
+# Batch matching
+# -------------------------
+def _same_zip(helper_zips, task_zips):
+    # helpers x tasks indicator built as (helper -> zip) @ (zip -> task)
+    codes = {z: i for i, z in enumerate(set(helper_zips) | set(task_zips))}
+
+    def one_hot(zips):
+        return sp.csr_matrix(
+            (np.ones(len(zips)), (np.arange(len(zips)), [codes[z] for z in zips])), shape=(len(zips), len(codes))
+        )
+
+    return (one_hot(helper_zips) @ one_hot(task_zips).T).tocsr()
+
+
+def match_helpers(conn, n=5, index=None, engine="tfidf", same_zip=True):
+    """Top-``n`` open tasks for every Helper with skills, scored in one sparse product.
+
+    Returns a DataFrame with columns helper_id, task_id, rank, score (rank 1 is
+    best; zero scores are left out), e.g. for notifications, digests or offline
+    evaluation. ``same_zip`` keeps only tasks in the helper's own ZIP, as the
+    Find Tasks view does.
+    """
+    columns = ["helper_id", "task_id", "rank", "score"]
+    helpers = conn.execute(
+        "SELECT id, zip, skills FROM users WHERE role='Helper' AND TRIM(IFNULL(skills, '')) != '' ORDER BY id"
+    ).fetchall()
+    tasks = conn.execute(
+        "SELECT id, title, description, category, zip FROM tasks WHERE status='Open' ORDER BY id DESC"
+    ).fetchall()
+    if not helpers or not tasks:
+        return pd.DataFrame(columns=columns)
+    if index is None:
+        index = make_index(engine)
+    scores = index.score_matrix(tasks, [h[2] for h in helpers])
+    if same_zip:
+        scores = scores.multiply(_same_zip([h[1] for h in helpers], [t[4] for t in tasks])).tocsr()
+    scores.eliminate_zeros()
+    scores.sort_indices()
+    rows = []
+    for i, helper in enumerate(helpers):
+        lo, hi = scores.indptr[i], scores.indptr[i + 1]
+        cols, vals = scores.indices[lo:hi], scores.data[lo:hi]
+        for rank, j in enumerate(top_k(vals, n), start=1):
+            rows.append((helper[0], tasks[cols[j]][0], rank, float(vals[j])))
+    return pd.DataFrame(rows, columns=columns)
+
+
+# -------------------------
+# Reverse matching
+# -------------------------
+class HelperMatrix:
+    """Helper skills as cached term counts, for ranking helpers against a task.
+
+    Skills are analyzed once, when a helper is added. Scoring a task maps the
+    skill terms onto the task index's columns, weights them with the index's
+    current IDF and takes one sparse matrix-vector product, so a helper's
+    score for a task equals the task's score in that helper's own ranking.
+    The LSA engine is scored on its TF-IDF base. Pass the indexes'
+    ``synonyms`` and their engine's ``analyzer`` so skills are analyzed and
+    expanded the same way queries are.
+    """
+
+    def __init__(self, synonyms=None, analyzer=_analyze_words):
+        self.synonyms = synonyms
+        self.analyzer = analyzer
+        self._lock = threading.RLock()
+        self._synced_id = 0                   # highest user id pulled by sync()
+        self.helpers = []                     # (id, name, zip, skills), one per row of _counts
+        self.terms = {}                       # analyzed skill term -> column of _counts
+        self._counts = sp.csr_matrix((0, 0))
+        self._weighted = None                 # (index weights, index columns, weighted rows, row norms)
+
+    def __len__(self):
+        return len(self.helpers)
+
+    def add(self, helpers):
+        """Add ``(id, name, zip, skills)`` rows; helpers without skills are skipped."""
+        with self._lock:
+            known = {h[0] for h in self.helpers}
+            new = [h for h in helpers if h[0] not in known and (h[3] or "").strip()]
+            if not new:
+                return
+            indptr, indices, data = [0], [], []
+            for helper in new:
+                terms = Counter(self.analyzer(helper[3]))
+                if self.synonyms is not None:
+                    terms = self.synonyms.expand(terms)
+                for term, tf in terms.items():
+                    indices.append(self.terms.setdefault(term, len(self.terms)))
+                    data.append(tf)
+                indptr.append(len(indices))
+            counts = self._counts.tocsr()
+            counts.resize((counts.shape[0], len(self.terms)))
+            batch = sp.csr_matrix((data, indices, indptr), shape=(len(new), len(self.terms)), dtype=np.float64)
+            self._counts = sp.vstack([counts, batch], format="csr")
+            self.helpers.extend(new)
+            self._weighted = None
+
+    def sync(self, conn):
+        """Add helpers who signed up since the last sync (skills are never edited)."""
+        with self._lock:
+            rows = conn.execute(
+                "SELECT id, name, zip, skills FROM users WHERE id > ? AND role='Helper' ORDER BY id",
+                (self._synced_id,),
+            ).fetchall()
+            self.add(rows)
+            if rows:
+                self._synced_id = rows[-1][0]
+
+    def _weights(self, index):
+        # Mirrors SparseIndex.query_vector for every helper at once: skill
+        # terms weighted by the index IDF (unseen terms count toward the norm
+        # only), rows scaled to unit length.
+        weights = index._weights()
+        if self._weighted is None or self._weighted[0] is not weights:
+            cols = index.term_columns(list(self.terms))
+            if index.use_idf:
+                unseen_idf = math.log(1 + len(index)) + 1
+                term_idf = np.where(cols >= 0, weights[0][np.maximum(cols, 0)], unseen_idf)
+            else:
+                term_idf = np.ones(len(cols))
+            rows = self._counts.multiply(term_idf).tocsr()
+            norms = np.sqrt(np.asarray(rows.multiply(rows).sum(axis=1)).ravel())
+            norms[norms == 0] = 1.0
+            self._weighted = weights, cols, rows, norms
+        return self._weighted[1:]
+
+    def score(self, index, task):
+        """Cosine score of every helper's skills against ``task``, aligned with ``helpers``."""
+        index = getattr(index, "base", index)
+        with self._lock, index._lock:
+            if not self.helpers:
+                return np.zeros(0)
+            index.add([task])
+            cols, rows, norms = self._weights(index)
+            task_row = index.task_vectors([task[0]])
+            x = np.zeros(len(cols))
+            mapped = cols >= 0
+            x[mapped] = task_row[:, cols[mapped]].toarray().ravel()
+        return rows @ x / norms
+
+    def recommend(self, index, task, k=5, zip_code=None):
+        """Best ``k`` helpers for ``task`` as ``(helper, score)``, optionally in one ZIP.
+
+        Helpers who share no skill term with the task are left out.
+        """
+        scores = self.score(index, task)
+        if zip_code is not None:
+            scores = np.where([h[2] == zip_code for h in self.helpers], scores, 0.0)
+        return [(self.helpers[i], float(scores[i])) for i in top_k(scores, k) if scores[i] > 0]